@@ -0,0 +1,165 @@
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+# -----------------------------
+# Step 1: Database Connection Settings
+# -----------------------------
+DB_TYPE = 'mssql+pyodbc'
+DB_HOST = 'IPGP-OX-AGP02'  # Replace with your correct server/host if needed
+DB_NAME = 'IPG-DW-PROTOTYPE'
+DB_DRIVER = 'ODBC Driver 17 for SQL Server'
+# The MRP_DB_URL environment variable overrides the connection string (e.g. "sqlite:///extract_test.db")
+connection_string = os.environ.get(
+    'MRP_DB_URL', f"{DB_TYPE}://@{DB_HOST}/{DB_NAME}?driver={DB_DRIVER}&trusted_connection=yes")
+
+# Connection pool shared by all extractors
+POOL_SIZE = 5          # Connections kept open between queries
+MAX_OVERFLOW = 5       # Extra connections allowed under load
+POOL_RECYCLE = 1800    # Seconds before a pooled connection is replaced
+POOL_PRE_PING = True   # Test each connection before handing it out (drops ones the server closed)
+
+# -----------------------------
+# Step 2: Shared, Lazily Created Engine
+# -----------------------------
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Returns the engine shared by all extractors.
+    It is created on first use (so importing an extractor does not connect) and pools its connections,
+    so a full refresh reuses them across queries.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                pool_options = {'pool_pre_ping': POOL_PRE_PING, 'pool_recycle': POOL_RECYCLE}
+                if make_url(connection_string).get_backend_name() != 'sqlite':
+                    pool_options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW)
+                _engine = create_engine(connection_string, **pool_options)
+    return _engine
+
+
+def dispose_engine():
+    """Close all pooled connections; the next get_engine() call creates a fresh engine."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+# -----------------------------
+# Step 3: Helper Function
+# -----------------------------
+def load_and_process_table(query, engine=None, rename_cols=None, additional_processing=None, params=None, **kwargs):
+    """
+    General-purpose function to run a SQL query (on the shared engine unless one is given)
+    and return a pandas DataFrame with optional renaming or post-processing.
+    'params' binds named parameters written as :name in the query.
+    """
+    try:
+        if params:
+            query = text(query)
+        df = pd.read_sql_query(query, con=engine if engine is not None else get_engine(), params=params)
+        if rename_cols:
+            df = df.rename(columns=rename_cols)
+        if additional_processing:
+            df = additional_processing(df, **kwargs)
+        return df
+    except Exception as e:
+        print(f"An error occurred while loading data: {e}")
+        return None
+
+
+# -----------------------------
+# Step 4: Streaming Extraction
+# -----------------------------
+CHUNK_SIZE = 50000  # Rows fetched per round trip in streaming mode
+
+# Column kinds a query schema can assign, with the Parquet type each one is written as
+SCHEMA_TYPES = {
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'string': pa.string(),
+    'datetime': pa.timestamp('us'),
+    'float32': pa.float32(),
+    'float64': pa.float64(),
+    'int8': pa.int8(),
+    'int16': pa.int16(),
+    'int32': pa.int32(),
+    'int64': pa.int64(),
+}
+
+
+def apply_schema(df, schema):
+    """
+    Convert the columns named in the schema ({column: kind}, kinds as in SCHEMA_TYPES) in place:
+      - 'category' / 'string': text (categorical for repetitive keys such as No_ or Document No_).
+      - 'datetime': parsed dates (unparseable values become NaT).
+      - numeric kinds: downcast numbers; integer kinds are nullable, so missing values survive.
+    Columns missing from the frame are ignored. Returns the frame.
+    """
+    for column, kind in (schema or {}).items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if kind in ('category', 'string'):
+            values = values.where(values.isna(), values.astype(str))
+            df[column] = values.astype('category') if kind == 'category' else values
+        elif kind == 'datetime':
+            df[column] = pd.to_datetime(values, errors='coerce')
+        elif kind.startswith('int'):
+            df[column] = pd.to_numeric(values, errors='coerce').astype(kind.capitalize())
+        else:
+            df[column] = pd.to_numeric(values, errors='coerce').astype(kind)
+    return df
+
+
+def _parquet_schema(first_chunk, schema):
+    """Parquet schema of the whole result: the query schema's types, the rest inferred from the first chunk."""
+    fields = []
+    for field in pa.Schema.from_pandas(first_chunk, preserve_index=False):
+        if field.name in (schema or {}):
+            field = field.with_type(SCHEMA_TYPES[schema[field.name]])
+        elif pa.types.is_null(field.type):
+            field = field.with_type(pa.string())  # All-missing in the first chunk
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def stream_query_to_parquet(query, output_file, schema=None, chunksize=CHUNK_SIZE):
+    """
+    Run a SQL query in streaming mode and write the result straight to a Parquet file:
+      - Rows are fetched from a server-side cursor, chunksize rows at a time.
+      - Each chunk is converted with apply_schema and appended to the file as a row group.
+    Peak memory is bounded by the chunk size, not the result size.
+    Returns the number of rows written, or None if an error occurred.
+    """
+    writer = None
+    rows = 0
+    try:
+        with get_engine().connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql_query(query, con=conn, chunksize=chunksize):
+                chunk = apply_schema(chunk, schema)
+                if writer is None:
+                    parquet_schema = _parquet_schema(chunk, schema)
+                    writer = pq.ParquetWriter(output_file, parquet_schema)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=parquet_schema, preserve_index=False))
+                rows += len(chunk)
+    except Exception as e:
+        print(f"An error occurred while streaming data: {e}")
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        print(f"The query returned no rows; '{output_file}' was not written.")
+    return rows
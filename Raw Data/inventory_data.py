@@ -1,37 +1,7 @@
-import pandas as pd
-from sqlalchemy import create_engine
+from db_extract import load_and_process_table
 
 # -----------------------------
-# Step 1: Database Connection Setup
-# -----------------------------
-DB_TYPE = 'mssql+pyodbc'
-DB_HOST = 'IPGP-OX-AGP02'  # Replace with your correct server/host if needed
-DB_NAME = 'IPG-DW-PROTOTYPE'
-DB_DRIVER = 'ODBC Driver 17 for SQL Server'
-connection_string = f"{DB_TYPE}://@{DB_HOST}/{DB_NAME}?driver={DB_DRIVER}&trusted_connection=yes"
-engine = create_engine(connection_string)
-
-# -----------------------------
-# Step 2: Helper Function
-# -----------------------------
-def load_and_process_table(query, engine, rename_cols=None, additional_processing=None, **kwargs):
-    """
-    General-purpose function to run a SQL query
-    and return a pandas DataFrame with optional renaming or post-processing.
-    """
-    try:
-        df = pd.read_sql_query(query, con=engine)
-        if rename_cols:
-            df = df.rename(columns=rename_cols)
-        if additional_processing:
-            df = additional_processing(df, **kwargs)
-        return df
-    except Exception as e:
-        print(f"An error occurred while loading data: {e}")
-        return None
-
-# -----------------------------
-# Step 3: The FULL Inventory Query
+# Step 1: The FULL Inventory Query
 # -----------------------------
 inventory_query = """
 WITH SourceData AS (
@@ -139,14 +109,14 @@ ORDER BY [Item No_];
 """
 
 # -----------------------------
-# Step 4: get_inventory_data() function
+# Step 2: get_inventory_data() function
 # -----------------------------
 def get_inventory_data():
     """
     Returns the DataFrame containing the inventory data
     loaded from the large SQL query above.
     """
-    df = load_and_process_table(query=inventory_query, engine=engine)
+    df = load_and_process_table(query=inventory_query)
     return df
 
 # -----------------------------
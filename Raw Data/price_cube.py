@@ -0,0 +1,109 @@
+import os
+import sys
+
+import pandas as pd
+
+from purchase_sync import PURCHASE_STORE_FILE, open_purchase_store
+
+# -----------------------------
+# Step 1: Window Settings
+# -----------------------------
+# The purchase store keeps monthly partial sums of Total and Quantity per vendor and item (table 'price_cube',
+# maintained by purchase_sync on every sync). A rolling window is answered from those partials: the whole
+# months inside it come from the cube, and only its partial first (and last) month is summed from the lines.
+PRICE_WINDOW_MONTHS = 36
+
+PRICE_COLUMNS = ['Buy-from Vendor No_', 'No_', 'Total', 'Quantity', 'Avg Unit Price']
+
+
+# -----------------------------
+# Step 2: Window Sums
+# -----------------------------
+def _window_bounds(months, as_of):
+    """(start, end) of the window: the 'months' months up to as_of (no end when as_of is None, i.e. today)."""
+    end = None if as_of is None else pd.Timestamp(as_of)
+    start = (pd.Timestamp.now() if end is None else end) - pd.DateOffset(months=months)
+    return start, end
+
+
+def _cube_sums(conn, first_month, last_month):
+    query = """
+        SELECT vendor, item, SUM(total) AS total, SUM(quantity) AS quantity FROM price_cube
+        WHERE month >= ? AND (? IS NULL OR month <= ?)
+        GROUP BY vendor, item"""
+    return pd.read_sql_query(query, conn, params=(first_month, last_month, last_month))
+
+
+def _line_sums(conn, month, start, end):
+    """Sums of the lines ordered in the given month between start and end (either may be None)."""
+    query = """
+        SELECT [Buy-from Vendor No_] AS vendor, [No_] AS item, TOTAL([Total]) AS total, TOTAL([Quantity]) AS quantity
+        FROM purchase_lines
+        WHERE strftime('%Y-%m', [Order Date]) = ?
+          AND [Buy-from Vendor No_] IS NOT NULL AND [No_] IS NOT NULL
+          AND (? IS NULL OR [Order Date] >= ?) AND (? IS NULL OR [Order Date] <= ?)
+        GROUP BY [Buy-from Vendor No_], [No_]"""
+    start = None if start is None else str(start)
+    end = None if end is None else str(end)
+    return pd.read_sql_query(query, conn, params=(month, start, start, end, end))
+
+
+def window_sums(conn, start, end=None):
+    """
+    Total and Quantity per vendor and item over the orders placed from start to end (no end if None):
+      - Whole months strictly inside the window are read from the price cube.
+      - The first month (and the last, if there is an end) is partial, so its lines are summed directly.
+    """
+    start_month = start.to_period('M')
+    end_month = None if end is None else end.to_period('M')
+    if start_month == end_month:
+        parts = [_line_sums(conn, str(start_month), start, end)]
+    else:
+        parts = [_line_sums(conn, str(start_month), start, None)]
+        if end is None:
+            parts.append(_cube_sums(conn, str(start_month + 1), None))
+        else:
+            if start_month + 1 <= end_month - 1:
+                parts.append(_cube_sums(conn, str(start_month + 1), str(end_month - 1)))
+            parts.append(_line_sums(conn, str(end_month), None, end))
+    sums = pd.concat(parts, ignore_index=True)
+    # A part without lines comes back with object columns, which would turn the sums into text
+    sums[['total', 'quantity']] = sums[['total', 'quantity']].astype(float)
+    return sums.groupby(['vendor', 'item'], as_index=False)[['total', 'quantity']].sum()
+
+
+# -----------------------------
+# Step 3: Average Unit Prices
+# -----------------------------
+def average_unit_prices(months=PRICE_WINDOW_MONTHS, as_of=None, store_file=PURCHASE_STORE_FILE):
+    """
+    Average unit price (sum of Total / sum of Quantity) per vendor and item over the orders of the last
+    'months' months (up to as_of, or up to now if None), read from the synced purchase store.
+    Returns a DataFrame with PRICE_COLUMNS, or None if the store has never been synced.
+    """
+    if not os.path.exists(store_file):
+        return None
+    conn = open_purchase_store(store_file)
+    try:
+        if not conn.execute("SELECT 1 FROM sync_state WHERE name = 'price_cube_built'").fetchone():
+            return None
+        sums = window_sums(conn, *_window_bounds(months, as_of))
+    finally:
+        conn.close()
+    prices = sums.rename(columns={'vendor': 'Buy-from Vendor No_', 'item': 'No_', 'total': 'Total',
+                                  'quantity': 'Quantity'})
+    prices['Avg Unit Price'] = prices['Total'] / prices['Quantity']
+    return prices[PRICE_COLUMNS]
+
+
+# -----------------------------
+# OPTIONAL: if run directly
+# -----------------------------
+if __name__ == "__main__":
+    # python price_cube.py [months]
+    window = int(sys.argv[1]) if len(sys.argv) > 1 else PRICE_WINDOW_MONTHS
+    prices_df = average_unit_prices(window)
+    if prices_df is None:
+        print("The purchase store has not been synced yet (run purchase_sync.py).")
+    else:
+        print(prices_df.sort_values('Avg Unit Price', ascending=False).head(10))
@@ -1,39 +1,10 @@
-import pandas as pd
-from sqlalchemy import create_engine
+from db_extract import load_and_process_table, stream_query_to_parquet
 
 # -----------------------------
-# Step 1: Database Connection Setup
+# Step 1: The FULL Purchase Query
 # -----------------------------
-DB_TYPE = 'mssql+pyodbc'
-DB_HOST = 'IPGP-OX-AGP02'  # Replace with your correct server/host if needed
-DB_NAME = 'IPG-DW-PROTOTYPE'
-DB_DRIVER = 'ODBC Driver 17 for SQL Server'
-connection_string = f"{DB_TYPE}://@{DB_HOST}/{DB_NAME}?driver={DB_DRIVER}&trusted_connection=yes"
-engine = create_engine(connection_string)
-
-# -----------------------------
-# Step 2: Helper Function
-# -----------------------------
-def load_and_process_table(query, engine, rename_cols=None, additional_processing=None, **kwargs):
-    """
-    General-purpose function to run a SQL query
-    and return a pandas DataFrame with optional renaming or post-processing.
-    """
-    try:
-        df = pd.read_sql_query(query, con=engine)
-        if rename_cols:
-            df = df.rename(columns=rename_cols)
-        if additional_processing:
-            df = additional_processing(df, **kwargs)
-        return df
-    except Exception as e:
-        print(f"An error occurred while loading data: {e}")
-        return None
-
-# -----------------------------
-# Step 3: The FULL Purchase Query
-# -----------------------------
-purchase_query = """
+# The query is assembled from parts, so the incremental sync (purchase_sync.py) can reuse them
+purchase_ctes = """
 WITH LineData AS (
     ----------------------------------------
     -- US010: IPG Photonics CORPORATION
@@ -192,7 +163,10 @@ ReceiptTable AS (
     WHERE InnerQuery.RowNumber = 1
       AND YEAR([Posting Date]) > 2017
 )
-SELECT
+"""
+
+# Output columns of the purchase query
+purchase_columns = """
     LineData.[Status],
     LineData.[Document Type],
     LineData.[Document No_],
@@ -219,6 +193,9 @@ SELECT
     HeaderData.[Order Confirmation Date],
     HeaderData.[Purchaser Code],
     LineData.[Subsidiary]
+"""
+
+purchase_joins = """
 FROM LineData
 JOIN HeaderData
     ON LineData.[Document No_] = HeaderData.[No_]
@@ -226,22 +203,64 @@ LEFT JOIN ReceiptTable
     ON LineData.[Document No_] = ReceiptTable.[Order #]
     AND LineData.[Line No_] = ReceiptTable.[Line No_]
     AND LineData.[No_] = ReceiptTable.[Item #]
+"""
+
+purchase_query = f"""
+{purchase_ctes}
+SELECT
+{purchase_columns}
+{purchase_joins}
 ORDER BY
     LineData.[Document No_], LineData.[Line No_];
-
 """
 
+# Column types applied when the purchase history is streamed to a file: keys and repetitive text are compacted,
+# quantities and amounts stay float64 so sums over the history keep their precision
+PURCHASE_SCHEMA = {
+    'Document No_': 'category',
+    'Line No_': 'int32',
+    'Buy-from Vendor No_': 'category',
+    'No_': 'category',
+    'Cost Center': 'category',
+    'Location Code': 'category',
+    'Expected Receipt Date': 'datetime',
+    'Promised Receipt Date': 'datetime',
+    'Qty_ per Unit of Measure': 'float64',
+    'Quantity': 'float64',
+    'Outstanding Quantity': 'float64',
+    'Unit Cost': 'float64',
+    'Requested Receipt Date': 'datetime',
+    'Total': 'float64',
+    'Planned Receipt Date': 'datetime',
+    'Quantity Delivered': 'float64',
+    'Order Date': 'datetime',
+    'Posting Date': 'datetime',
+    'Assigned User ID': 'category',
+    'Order Confirmation Date': 'datetime',
+    'Purchaser Code': 'category',
+    'Subsidiary': 'category',
+}
+
 # -----------------------------
-# Step 4: get_purchase_data() function
+# Step 2: get_purchase_data() function
 # -----------------------------
 def get_purchase_data():
     """
     Returns the DataFrame containing the purchase data
     loaded from the large SQL query above.
     """
-    df = load_and_process_table(query=purchase_query, engine=engine)
+    df = load_and_process_table(query=purchase_query)
     return df
 
+
+def stream_purchase_data(output_file="purchase_data.parquet"):
+    """
+    Streams the purchase history straight to a Parquet file in chunks, with PURCHASE_SCHEMA applied,
+    so memory stays bounded however many lines are returned.
+    Returns the number of rows written (None on error).
+    """
+    return stream_query_to_parquet(purchase_query, output_file, schema=PURCHASE_SCHEMA)
+
 # -----------------------------
 # OPTIONAL: if run directly
 # -----------------------------
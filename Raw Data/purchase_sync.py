@@ -0,0 +1,248 @@
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from sqlalchemy.engine import make_url
+
+from db_extract import connection_string, load_and_process_table
+from purchase_data import PURCHASE_SCHEMA, purchase_columns, purchase_ctes, purchase_joins
+
+# -----------------------------
+# Step 1: Local Store and High-Water Mark
+# -----------------------------
+# Purchase lines pulled so far, kept between runs. HISTORY lines are posted and never change, so only lines
+# posted since the high-water mark are fetched again. The fetch reaches back WATERMARK_LOOKBACK_DAYS before the
+# mark (re-read lines replace their stored copies), so lines posted late with an earlier Posting Date are still
+# picked up; a line backdated further than that is only fetched by a full sync (--full). OPEN lines carry no
+# change stamp in the warehouse, so the open order book is fetched on its own (without scanning history) and
+# replaces the stored OPEN lines.
+PURCHASE_STORE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Purchase Store.sqlite")
+
+WATERMARK_LOOKBACK_DAYS = 7
+
+# Date a HISTORY line was posted (its header's posting date, or order date if it has none)
+WATERMARK_DATE = 'Header Posting Date'
+
+WATERMARK_KEYS = ['history_date', 'history_document_no', 'history_line_no']
+
+# -----------------------------
+# Step 2: The Incremental Queries
+# -----------------------------
+history_sync_query = f"""
+{purchase_ctes}
+SELECT
+{purchase_columns.rstrip()},
+    COALESCE(HeaderData.[Posting Date], HeaderData.[Order Date]) AS [{WATERMARK_DATE}]
+{purchase_joins}
+WHERE LineData.[Status] = 'HISTORY'
+  AND COALESCE(HeaderData.[Posting Date], HeaderData.[Order Date]) >= :since
+ORDER BY
+    LineData.[Document No_], LineData.[Line No_];
+"""
+
+open_sync_query = f"""
+{purchase_ctes}
+SELECT
+{purchase_columns}
+{purchase_joins}
+WHERE LineData.[Status] = 'OPEN'
+ORDER BY
+    LineData.[Document No_], LineData.[Line No_];
+"""
+
+# Plain-SQL stand-ins used when MRP_DB_URL points at an SQLite database (e.g. for testing); the tables hold
+# the columns of the queries above
+SQLITE_STANDIN_QUERIES = {
+    'history': f"SELECT * FROM purchase_history_lines WHERE [{WATERMARK_DATE}] >= :since",
+    'open': "SELECT * FROM purchase_open_lines",
+}
+
+
+def sync_queries():
+    """The (history, open) queries for the configured database (stand-ins for SQLite)."""
+    if make_url(connection_string).get_backend_name() == 'sqlite':
+        return SQLITE_STANDIN_QUERIES['history'], SQLITE_STANDIN_QUERIES['open']
+    return history_sync_query, open_sync_query
+
+
+# -----------------------------
+# Step 3: Sync and Load
+# -----------------------------
+def open_purchase_store(store_file=PURCHASE_STORE_FILE):
+    """
+    Open (and create if needed) the purchase store:
+      - 'purchase_lines' holds the pulled lines (created on the first sync).
+      - 'sync_state' holds the high-water mark.
+      - 'price_cube' holds monthly partial sums of Total and Quantity per vendor and item (by Order Date),
+        kept up to date by every sync and read by price_cube.py.
+    """
+    conn = sqlite3.connect(store_file)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS price_cube (
+            vendor,
+            item,
+            month TEXT,
+            total REAL,
+            quantity REAL,
+            PRIMARY KEY (vendor, item, month)
+        );
+    """)
+    return conn
+
+
+def read_watermark(conn):
+    """The high-water mark (posting date, document no., line no.) of the stored HISTORY lines, or None."""
+    state = dict(conn.execute("SELECT name, value FROM sync_state").fetchall())
+    if not all(key in state for key in WATERMARK_KEYS):
+        return None
+    return pd.Timestamp(state['history_date']), state['history_document_no'], int(state['history_line_no'])
+
+
+def _has_lines_table(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'purchase_lines'").fetchone()
+
+
+def _order_months(df):
+    return set(pd.to_datetime(df['Order Date']).dropna().dt.strftime('%Y-%m'))
+
+
+def _affected_months(conn, history_df, open_df):
+    """Order months whose lines a merge of these fetched lines will remove or add."""
+    months = _order_months(history_df) | _order_months(open_df)
+    if _has_lines_table(conn):
+        months.update(month for (month,) in conn.execute("""
+            SELECT DISTINCT strftime('%Y-%m', [Order Date]) FROM purchase_lines
+            WHERE [Order Date] IS NOT NULL
+              AND ([Status] = 'OPEN'
+                   OR ([Status] = 'HISTORY' AND EXISTS (SELECT 1 FROM temp.fetched f
+                                                         WHERE f.[Document No_] = purchase_lines.[Document No_]
+                                                           AND f.[Line No_] = purchase_lines.[Line No_])))"""))
+    return months
+
+
+def _refresh_price_cube(conn, months=None):
+    """Recompute the price cube's partial sums for the given order months (all months if None)."""
+    month_of = "strftime('%Y-%m', [Order Date])"
+    if months is None:
+        conn.execute("DELETE FROM price_cube")
+        month_filter = ""
+    else:
+        conn.execute("DROP TABLE IF EXISTS temp.months")
+        conn.execute("CREATE TEMP TABLE months (month TEXT PRIMARY KEY)")
+        conn.executemany("INSERT INTO temp.months VALUES (?)", [(month,) for month in months])
+        conn.execute("DELETE FROM price_cube WHERE month IN (SELECT month FROM temp.months)")
+        month_filter = f"AND {month_of} IN (SELECT month FROM temp.months)"
+    if _has_lines_table(conn):
+        conn.execute(f"""
+            INSERT INTO price_cube
+            SELECT [Buy-from Vendor No_], [No_], {month_of}, TOTAL([Total]), TOTAL([Quantity])
+            FROM purchase_lines
+            WHERE [Order Date] IS NOT NULL AND [Buy-from Vendor No_] IS NOT NULL AND [No_] IS NOT NULL {month_filter}
+            GROUP BY [Buy-from Vendor No_], [No_], {month_of}""")
+    conn.execute("INSERT OR REPLACE INTO sync_state VALUES ('price_cube_built', '1')")
+
+
+def _fill_fetched_keys(conn, history_df):
+    conn.execute("DROP TABLE IF EXISTS temp.fetched")
+    conn.execute("CREATE TEMP TABLE fetched ([Document No_], [Line No_])")
+    conn.executemany("INSERT INTO temp.fetched VALUES (?, ?)",
+                     history_df[['Document No_', 'Line No_']].drop_duplicates().itertuples(index=False))
+
+
+def _merge_lines(conn, history_df, open_df):
+    """
+    Replace the stored OPEN lines and the stored HISTORY lines re-fetched (by document and line no., listed in
+    temp.fetched by _fill_fetched_keys).
+    """
+    if _has_lines_table(conn):
+        conn.execute("DELETE FROM purchase_lines WHERE [Status] = 'OPEN'")
+        conn.execute("""
+            DELETE FROM purchase_lines
+            WHERE [Status] = 'HISTORY'
+              AND EXISTS (SELECT 1 FROM temp.fetched f
+                          WHERE f.[Document No_] = purchase_lines.[Document No_]
+                            AND f.[Line No_] = purchase_lines.[Line No_])""")
+    open_df = open_df.assign(**{WATERMARK_DATE: pd.NaT})
+    for df in (history_df, open_df):
+        if len(df):
+            df.to_sql('purchase_lines', conn, if_exists='append', index=False)
+
+
+def sync_purchase_data(store_file=PURCHASE_STORE_FILE, full=False):
+    """
+    Bring the local purchase store up to date:
+      - HISTORY lines posted since WATERMARK_LOOKBACK_DAYS before the high-water mark (all of them on the first
+        sync or with full=True).
+      - The current OPEN lines.
+    Both queries run concurrently; the results are merged into the store, the price cube is refreshed for the
+    order months that changed and the high-water mark is advanced.
+    Returns True on success.
+    """
+    conn = open_purchase_store(store_file)
+    try:
+        if full:
+            conn.execute("DROP TABLE IF EXISTS purchase_lines")
+            conn.execute("DELETE FROM sync_state")
+        watermark = read_watermark(conn)
+        since = watermark[0] - pd.Timedelta(days=WATERMARK_LOOKBACK_DAYS) if watermark else pd.Timestamp('1900-01-01')
+
+        history_query, open_query = sync_queries()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            history_future = pool.submit(load_and_process_table, query=history_query,
+                                         params={'since': since.to_pydatetime()})
+            open_future = pool.submit(load_and_process_table, query=open_query)
+            history_df, open_df = history_future.result(), open_future.result()
+        if history_df is None or open_df is None:
+            print("Purchase store not updated: the purchase lines could not be loaded.")
+            return False
+
+        with conn:
+            cube_built = conn.execute("SELECT 1 FROM sync_state WHERE name = 'price_cube_built'").fetchone()
+            _fill_fetched_keys(conn, history_df)
+            months = _affected_months(conn, history_df, open_df) if cube_built else None
+            _merge_lines(conn, history_df, open_df)
+            _refresh_price_cube(conn, months)
+            if len(history_df):
+                history_df[WATERMARK_DATE] = pd.to_datetime(history_df[WATERMARK_DATE])
+                last = history_df.sort_values([WATERMARK_DATE, 'Document No_', 'Line No_']).iloc[-1]
+                latest = (last[WATERMARK_DATE], str(last['Document No_']), int(last['Line No_']))
+                if watermark is None or latest > watermark:
+                    conn.executemany("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", [
+                        ('history_date', latest[0].isoformat()),
+                        ('history_document_no', latest[1]),
+                        ('history_line_no', str(latest[2])),
+                    ])
+        print(f"Purchase store: {len(history_df)} history line(s) posted since {since.date()} merged, "
+              f"{len(open_df)} open line(s) refreshed.")
+        return True
+    finally:
+        conn.close()
+
+
+def load_stored_purchase_data(store_file=PURCHASE_STORE_FILE):
+    """All stored purchase lines, in the column layout and order of purchase_query (None if never synced)."""
+    conn = open_purchase_store(store_file)
+    try:
+        if not _has_lines_table(conn):
+            return None
+        df = pd.read_sql_query(
+            "SELECT * FROM purchase_lines ORDER BY [Document No_], [Line No_]", conn).drop(columns=WATERMARK_DATE)
+    finally:
+        conn.close()
+    for column, kind in PURCHASE_SCHEMA.items():
+        if kind == 'datetime' and column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+
+# -----------------------------
+# OPTIONAL: if run directly
+# -----------------------------
+if __name__ == "__main__":
+    # "python purchase_sync.py" syncs the store; "python purchase_sync.py --full" rebuilds it from scratch.
+    if sync_purchase_data(full='--full' in sys.argv[1:]):
+        purchase_df = load_stored_purchase_data()
+        print("Total records:", len(purchase_df))
@@ -1,39 +1,104 @@
+import os
+
 import streamlit as st
 import pandas as pd
 
 # Import your existing MRP functions
-from data_loader import load_bom_data, load_sales_orders
+from data_loader import load_workbook_data
 from bom_explosion import create_bom_hierarchy
-from inventory_management import process_transactions
+from bom_store import create_bom_hierarchy_from_store
+from inventory_management import process_transactions, save_results
+from output_sinks import output_path
+from config import EXCEL_FILE, USE_BOM_STORE, OUTPUT_NET_REQ, OUTPUT_UPDATED_INV, DASHBOARD_CACHE_ENTRIES
+from config import PLANNING_BUCKET
+
+
+# --- Cached pipeline stages ---
+# Every stage is cached on the workbook's path, size and mtime (plus the netting mode), so a rerun with an
+# unchanged workbook costs only the rendering; arguments starting with '_' are not hashed by Streamlit.
+# At most DASHBOARD_CACHE_ENTRIES results are kept per stage. The stages only compute: the result files
+# are written outside the caches (see save_displayed_results).
+
+
+@st.cache_data(max_entries=DASHBOARD_CACHE_ENTRIES, show_spinner="Loading the MRP workbook...")
+def load_inputs(excel_file, size, mtime_ns):
+    """The workbook bundle; keyed by the file's size and mtime."""
+    return load_workbook_data(excel_file)
+
+
+@st.cache_data(max_entries=DASHBOARD_CACHE_ENTRIES, show_spinner="Exploding BOMs...")
+def explode_boms(excel_file, size, mtime_ns, _mrp_data):
+    """The exploded BOM hierarchy of the workbook's sold items; keyed by the workbook."""
+    top_level_indices = _mrp_data.top_level_indices()
+    if USE_BOM_STORE:
+        bom_hierarchy_df, _ = create_bom_hierarchy_from_store(_mrp_data.bom, top_level_indices)
+    else:
+        bom_hierarchy_df, _ = create_bom_hierarchy(_mrp_data.bom, top_level_indices)
+    return bom_hierarchy_df
+
+
+@st.cache_data(max_entries=DASHBOARD_CACHE_ENTRIES, show_spinner="Netting requirements...")
+def net_requirements(excel_file, size, mtime_ns, bucket, _bom_hierarchy_df, _mrp_data):
+    """The netting results (not exported); keyed by the workbook and the netting mode."""
+    return process_transactions(_bom_hierarchy_df, _mrp_data, bucket, export=False)
+
+
+def run_pipeline(bucket=PLANNING_BUCKET):
+    """
+    Run (or fetch from the caches) every stage for the current workbook.
+    Returns the key of the results (workbook path, size, mtime and netting mode) and the results,
+    or None if the workbook cannot be loaded.
+    """
+    stat = os.stat(EXCEL_FILE)
+    workbook_key = (EXCEL_FILE, stat.st_size, stat.st_mtime_ns)
+    mrp_data = load_inputs(*workbook_key)
+    if mrp_data is None:
+        return None
+    bom_hierarchy_df = explode_boms(*workbook_key, mrp_data)
+    return workbook_key + (bucket,), net_requirements(*workbook_key, bucket, bom_hierarchy_df, mrp_data)
+
+
+def save_displayed_results(results_key, results):
+    """
+    Write the displayed results to the output files, unless this session already wrote these exact results
+    (same workbook and netting mode), so the files on disk always hold what is shown.
+    """
+    if st.session_state.get('saved_results') != results_key:
+        save_results(*results)
+        st.session_state['saved_results'] = results_key
+
 
 # App Title
 st.title("MRP Tool Dashboard")
 
-# When the button is pressed, the code runs the MRP process and saves the Excel files
-if st.button("Run MRP Process"):
-    st.write("Processing data...")
+# Per-document netting keeps the pegging to each sales / purchase document; buckets aggregate them per item
+BUCKET_LABELS = {None: "Per document", 'day': "Daily buckets", 'week': "Weekly buckets", 'month': "Monthly buckets"}
+bucket = st.selectbox("Netting mode", list(BUCKET_LABELS), index=list(BUCKET_LABELS).index(PLANNING_BUCKET),
+                      format_func=BUCKET_LABELS.get)
 
-    # Load the necessary data
-    bom_data = load_bom_data()
-    sales_orders_df = load_sales_orders()
+# When the button is pressed, the code runs the MRP process and saves the result files. The results stay
+# on screen across reruns (widget interactions) and are served from the caches while the workbook is unchanged;
+# the files are rewritten whenever the displayed results change (e.g. another netting mode).
+if st.button("Run MRP Process"):
+    st.session_state['mrp_ran'] = True
+    # A button press always rewrites the result files
+    st.session_state['saved_results'] = None
 
-    # Create the BOM hierarchy based on the top-level sales order indices
-    top_level_indices = sales_orders_df['Index'].tolist()
-    bom_hierarchy_df, _ = create_bom_hierarchy(bom_data, top_level_indices)
+run = run_pipeline(bucket) if st.session_state.get('mrp_ran') else None
+if st.session_state.get('mrp_ran') and run is None:
+    st.error(f"Error loading '{EXCEL_FILE}'.")
 
-    # Process transactions (this returns two DataFrames)
-    final_df, updated_inventory_df = process_transactions(bom_hierarchy_df, "MRP Data.xlsx")
+if run is not None:
+    results_key, results = run
+    save_displayed_results(results_key, results)
+    final_df, updated_inventory_df = results
 
     # Remove duplicate columns from updated_inventory_df to avoid errors when displaying it
     updated_inventory_df = updated_inventory_df.loc[:, ~updated_inventory_df.columns.duplicated()]
 
-    # Save the resulting DataFrames as Excel files in the current project folder
-    final_excel_filename = "Final_Net_Requirements_Based_on_Inventory.xlsx"
-    updated_inventory_filename = "Updated_Inventory.xlsx"
-    final_df.to_excel(final_excel_filename, index=False)
-    updated_inventory_df.to_excel(updated_inventory_filename, index=False)
-
-    st.success("MRP Process Complete! Excel files saved in the project folder.")
+    # save_displayed_results has written both tables through the output sink selected in config.py
+    st.success(f"MRP Process Complete! {output_path(OUTPUT_NET_REQ)} and {output_path(OUTPUT_UPDATED_INV)} "
+               f"saved in the project folder.")
 
     # Display results in the app
     st.subheader("Production Requirements")
@@ -0,0 +1,160 @@
+# benchmarks/generator.py
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from config import BOM_SHEET, SALES_ORDERS_SHEET, INVENTORY_SHEET, ITEM_TABLE_SHEET, PURCHASES_SHEET
+from data_loader import MrpData
+from dtype_plan import apply_dtype_plan
+
+# Shape of a synthetic data set:
+#   - n_items: items in the Item Table (finished goods, subassemblies and purchased parts).
+#   - depth: BOM levels below the finished goods.
+#   - fan_out: average components per BOM.
+#   - shared_ratio: share of BOM lines that reuse a component already used elsewhere on the same level.
+#   - cycle_rate: extra BOM lines closing a circular reference, as a share of the BOM lines.
+#   - n_sales / n_purchases: order lines; lines_per_document: average lines per document.
+DEFAULT_PARAMS = {
+    'n_items': 2000,
+    'depth': 4,
+    'fan_out': 3,
+    'shared_ratio': 0.3,
+    'cycle_rate': 0.002,
+    'n_sales': 1000,
+    'n_purchases': 300,
+    'lines_per_document': 3,
+    'seed': 0,
+}
+
+START_DATE = pd.Timestamp('2025-01-01')
+HORIZON_DAYS = 180
+
+
+def _level_sizes(n_items, depth, fan_out):
+    """Items per BOM level (finished goods first), growing by the fan-out from one level to the next."""
+    weights = np.asarray([float(fan_out) ** level for level in range(depth + 1)])
+    sizes = np.maximum(1, np.floor(n_items * weights / weights.sum()).astype(int))
+    sizes[-1] += max(0, n_items - sizes.sum())
+    return sizes
+
+
+def generate_bom(rng, level_items, fan_out, shared_ratio, cycle_rate):
+    """
+    BOM lines ('Parent Index', 'Child Index', 'QTY Per') between consecutive levels:
+      - Every parent gets 1 + Poisson(fan_out - 1) components from the next level.
+      - Components are taken in turn from the next level, except for a shared_ratio share reused at random.
+      - round(cycle_rate * lines) extra lines point from a component back to its grandparent (circular references).
+    """
+    parents, children = [], []
+    for level in range(len(level_items) - 1):
+        below = level_items[level + 1]
+        counts = 1 + rng.poisson(max(fan_out - 1, 0), len(level_items[level]))
+        level_parents = np.repeat(level_items[level], counts)
+        fresh = below[np.arange(len(level_parents)) % len(below)]
+        shared = rng.random(len(level_parents)) < shared_ratio
+        level_children = np.where(shared, rng.choice(below, len(level_parents)), fresh)
+        parents.append(level_parents)
+        children.append(level_children)
+    parents = np.concatenate(parents) if parents else np.array([], dtype=np.int64)
+    children = np.concatenate(children) if children else np.array([], dtype=np.int64)
+
+    # Each circular reference closes a loop grandparent -> parent -> child -> grandparent
+    n_cycles = int(round(cycle_rate * len(parents)))
+    if n_cycles:
+        # Lines whose parent is itself a component, and the first line using each component (its parent)
+        with_grandparent = np.flatnonzero(np.isin(parents, children))
+        line_of_child = pd.Series(np.arange(len(children)), index=children).groupby(level=0).first()
+        if len(with_grandparent):
+            picked = rng.choice(with_grandparent, n_cycles)
+            grandparents = parents[line_of_child[parents[picked]].to_numpy()]
+            parents = np.concatenate([parents, children[picked]])
+            children = np.concatenate([children, grandparents])
+
+    bom = pd.DataFrame({
+        'Parent Index': parents,
+        'Child Index': children,
+        'QTY Per': rng.choice([0.5, 1.0, 1.0, 2.0, 3.0, 4.0], len(parents)),
+    })
+    return bom.drop_duplicates(subset=['Parent Index', 'Child Index'], ignore_index=True)
+
+
+def _document_numbers(rng, prefix, n_lines, lines_per_document):
+    n_documents = max(1, n_lines // max(lines_per_document, 1))
+    return [f'{prefix}{number:06d}' for number in rng.integers(1, n_documents + 1, n_lines)]
+
+
+def generate_mrp_data(params=None):
+    """
+    A seeded synthetic MrpData bundle (same columns as data_loader.load_workbook_data returns).
+    'params' overrides entries of DEFAULT_PARAMS; the same parameters always give the same data.
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    rng = np.random.default_rng(params['seed'])
+
+    # --- Item Table ---
+    sizes = _level_sizes(params['n_items'], params['depth'], params['fan_out'])
+    item_indices = np.arange(1, sizes.sum() + 1)
+    level_items = np.split(item_indices, np.cumsum(sizes)[:-1])
+    item_table = pd.DataFrame({
+        'Item Index': item_indices,
+        'No_': [f'ITEM-{index:06d}' for index in item_indices],
+        'Rev #': rng.choice(['A', 'B', ''], len(item_indices)),
+    })
+
+    # --- BOM ---
+    bom = generate_bom(rng, level_items, params['fan_out'], params['shared_ratio'], params['cycle_rate'])
+
+    # --- Sales Orders: mostly finished goods, some spare parts sold directly ---
+    n_sales = params['n_sales']
+    spares = rng.random(n_sales) < 0.05
+    sales_orders = pd.DataFrame({
+        'Index': np.where(spares, rng.choice(item_indices, n_sales), rng.choice(level_items[0], n_sales)),
+        'QTY': rng.integers(1, 25, n_sales).astype(float),
+        'Date': START_DATE + pd.to_timedelta(rng.integers(0, HORIZON_DAYS, n_sales), unit='D'),
+        'Document No_': _document_numbers(rng, 'SO', n_sales, params['lines_per_document']),
+    })
+
+    # --- Inventory: about half of the items are in stock ---
+    stocked = rng.choice(item_indices, len(item_indices) // 2, replace=False)
+    inventory = pd.DataFrame({
+        'Index': np.sort(stocked),
+        'Inventory': rng.integers(0, 200, len(stocked)).astype(float),
+    })
+
+    # --- Purchases of components ---
+    n_purchases = params['n_purchases']
+    components = item_indices[sizes[0]:] if len(level_items) > 1 else item_indices
+    purchases = pd.DataFrame({
+        'Index': rng.choice(components, n_purchases),
+        'QTY': rng.integers(10, 500, n_purchases).astype(float),
+        'Expected Receipt Date': START_DATE + pd.to_timedelta(rng.integers(0, HORIZON_DAYS, n_purchases), unit='D'),
+        'Document No_': _document_numbers(rng, 'PO', n_purchases, params['lines_per_document']),
+    })
+
+    return MrpData(bom=apply_dtype_plan(bom), sales_orders=apply_dtype_plan(sales_orders),
+                   inventory=apply_dtype_plan(inventory), item_table=apply_dtype_plan(item_table),
+                   purchases=apply_dtype_plan(purchases))
+
+
+def write_workbook(mrp_data, excel_file):
+    """Write the bundle as an MRP workbook (sheet and column names as in 'MRP Data.xlsx'), e.g. to run main.py on it."""
+    bom = mrp_data.bom.rename(columns={'Parent Index': 'Parent', 'Child Index': 'Child', 'QTY Per': 'Total'})
+    with pd.ExcelWriter(excel_file) as writer:
+        bom.to_excel(writer, sheet_name=BOM_SHEET, index=False)
+        mrp_data.sales_orders.to_excel(writer, sheet_name=SALES_ORDERS_SHEET, index=False)
+        mrp_data.inventory.to_excel(writer, sheet_name=INVENTORY_SHEET, index=False)
+        mrp_data.item_table.to_excel(writer, sheet_name=ITEM_TABLE_SHEET, index=False)
+        mrp_data.purchases.to_excel(writer, sheet_name=PURCHASES_SHEET, index=False)
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.generator "Synthetic MRP Data.xlsx" --n_items 5000 --seed 1   (from the project folder)
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic MRP workbook.")
+    parser.add_argument('excel_file')
+    for name, default in DEFAULT_PARAMS.items():
+        parser.add_argument(f'--{name}', type=type(default), default=default)
+    args = vars(parser.parse_args())
+    excel_file = args.pop('excel_file')
+    write_workbook(generate_mrp_data(args), excel_file)
+    print(f"Synthetic workbook saved to '{excel_file}'.")
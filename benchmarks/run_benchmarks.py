@@ -0,0 +1,174 @@
+# benchmarks/run_benchmarks.py
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.generator import DEFAULT_PARAMS, generate_mrp_data
+from bom_explosion import create_bom_hierarchy
+from inventory_management import InventoryLedger, prepare_inventory, prepare_sales_orders, process_transactions
+from item_mapping import create_item_hierarchy
+from mrp_engine import plan_by_low_level_code
+from output_sinks import write_table
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BENCHMARK_DIR, "results.json")
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Data set sizes (overrides of generator.DEFAULT_PARAMS)
+SIZES = {
+    'small': {'n_items': 500, 'n_sales': 100, 'n_purchases': 50},
+    'medium': {'n_items': 2000, 'n_sales': 400, 'n_purchases': 200},
+    'large': {'n_items': 10000, 'n_sales': 2000, 'n_purchases': 1000},
+}
+
+# A stage is a regression when it is slower than the baseline by more than the tolerance,
+# and by more than MIN_REGRESSION_SECONDS (so timer noise on very short stages is ignored)
+REGRESSION_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def _best_time(func, repeat, verbose):
+    """Run func 'repeat' times; returns the fastest wall time and the result of the last run."""
+    best = None
+    for _ in range(repeat):
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            start = time.perf_counter()
+            result = func()
+            seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def _prepare_sales_orders(mrp_data, bom_hierarchy_df):
+    inventory_df = prepare_inventory(mrp_data.inventory.copy())
+    ledger = InventoryLedger(inventory_df, [
+        bom_hierarchy_df['Child Index'], mrp_data.sales_orders['Index'], mrp_data.purchases['Index']])
+    return prepare_sales_orders(mrp_data.sales_orders.copy(), ledger)
+
+
+def benchmark_size(params, repeat=3, verbose=False):
+    """
+    Time each pipeline stage on one synthetic data set (best of 'repeat' runs):
+      - create_bom_hierarchy, prepare_sales_orders, process_transactions (including its own export),
+        create_item_hierarchy, and the Excel export of the net requirements.
+      - plan_by_low_level_code (the low-level-code engine, daily buckets, including its own export).
+    Output files are written to a temporary folder.
+    Returns {'params', 'rows', 'seconds'}.
+    """
+    mrp_data = generate_mrp_data(params)
+    top_level_indices = mrp_data.top_level_indices()
+    seconds = {}
+    rows = {'bom': len(mrp_data.bom), 'sales_orders': len(mrp_data.sales_orders),
+            'purchases': len(mrp_data.purchases)}
+
+    working_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as output_dir:
+        os.chdir(output_dir)
+        try:
+            seconds['create_bom_hierarchy'], (bom_hierarchy_df, _) = _best_time(
+                lambda: create_bom_hierarchy(mrp_data.bom, top_level_indices), repeat, verbose)
+            rows['bom_hierarchy'] = len(bom_hierarchy_df)
+            seconds['prepare_sales_orders'], _ = _best_time(
+                lambda: _prepare_sales_orders(mrp_data, bom_hierarchy_df), repeat, verbose)
+            seconds['process_transactions'], (final_df, _) = _best_time(
+                lambda: process_transactions(bom_hierarchy_df, mrp_data), repeat, verbose)
+            rows['net_requirements'] = len(final_df)
+            seconds['create_item_hierarchy'], _ = _best_time(
+                lambda: create_item_hierarchy(bom_hierarchy_df, mrp_data.item_lookup()), repeat, verbose)
+            seconds['excel_export'], _ = _best_time(
+                lambda: write_table(final_df, "Benchmark Export.xlsx", output_format='xlsx'), repeat, verbose)
+            seconds['plan_by_low_level_code'], (plan_df, _) = _best_time(
+                lambda: plan_by_low_level_code(mrp_data, 'day'), repeat, verbose)
+            rows['mrp_plan'] = len(plan_df)
+        finally:
+            os.chdir(working_dir)
+    return {'params': {**DEFAULT_PARAMS, **params}, 'rows': rows, 'seconds': seconds}
+
+
+def run_benchmarks(sizes=('small', 'medium'), repeat=3, verbose=False):
+    """Benchmark every size in 'sizes' (keys of SIZES); returns the results document saved as JSON."""
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.platform(),
+        'repeat': repeat,
+        'sizes': {},
+    }
+    for size in sizes:
+        print(f"Benchmarking '{size}'...")
+        results['sizes'][size] = benchmark_size(SIZES[size], repeat, verbose)
+        for stage, seconds in results['sizes'][size]['seconds'].items():
+            print(f"  {stage}: {seconds:.3f}s")
+    return results
+
+
+def compare_results(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compare every stage timed in both results and baseline (for sizes generated with the same parameters);
+    prints one line per stage.
+    Returns the list of (size, stage) pairs that regressed.
+    """
+    regressions = []
+    print(f"{'size':<8} {'stage':<24} {'baseline':>9} {'current':>9} {'ratio':>7}")
+    for size, result in results['sizes'].items():
+        base_result = baseline.get('sizes', {}).get(size, {})
+        if base_result and base_result.get('params') != result['params']:
+            print(f"{size:<8} skipped: the baseline was recorded with other data set parameters")
+            continue
+        base_seconds = base_result.get('seconds', {})
+        for stage, seconds in result['seconds'].items():
+            if stage not in base_seconds:
+                continue
+            base = base_seconds[stage]
+            ratio = seconds / base if base > 0 else float('inf')
+            regressed = ratio > 1 + tolerance and seconds - base > MIN_REGRESSION_SECONDS
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{size:<8} {stage:<24} {base:>8.3f}s {seconds:>8.3f}s {ratio:>6.2f}x{flag}")
+            if regressed:
+                regressions.append((size, stage))
+    return regressions
+
+
+def _save_json(document, path):
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"Results saved to '{path}'.")
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.run_benchmarks [--sizes small medium large] [--save-baseline]   (from the project folder)
+    parser = argparse.ArgumentParser(description="Time the MRP pipeline stages on synthetic data.")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=3, help="runs per stage (the fastest counts)")
+    parser.add_argument('--output', default=RESULTS_FILE, help="JSON file for the results")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="JSON file of the baseline results")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help="allowed slowdown before a stage counts as a regression (0.25 = 25%%)")
+    parser.add_argument('--verbose', action='store_true', help="show the pipeline's own output")
+    args = parser.parse_args()
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        # Without a baseline there is nothing to compare against, so the check must not pass silently
+        sys.exit(f"No baseline at '{args.baseline}'; run with --save-baseline to store one.")
+    results = run_benchmarks(args.sizes, args.repeat, args.verbose)
+    _save_json(results, args.output)
+    if args.save_baseline:
+        _save_json(results, args.baseline)
+    else:
+        with open(args.baseline) as f:
+            if compare_results(results, json.load(f), args.tolerance):
+                print("Performance regressions found.")
+                sys.exit(1)
+        print("No performance regressions.")
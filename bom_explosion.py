@@ -1,61 +1,671 @@
 # bom_explosion.py
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
+from scipy import sparse
+
+from config import BOM_EXPLOSION_WORKERS
+from dtype_plan import apply_dtype_plan
+from instrumentation import start_stage
+from output_sinks import write_table
+
+# 'Parent Row' is the position of each row's parent row among the rows of the same production item
+# (-1 for level 0), so later stages can look parents up by position instead of searching for them
+BOM_HIERARCHY_COLUMNS = ['Order', 'Production Index', 'Level', 'Parent Index', 'Child Index', 'QTY Per',
+                         'Total Quantity', 'Parent Row']
+
+# Memoized subtrees up to this many rows are stitched in through plain lists rather than array chunks
+SMALL_BLOCK_ROWS = 64
+
+
+class BomIndex:
+    """
+    Parent -> children index over the BOM sheet, built once and shared by every explosion:
+      - Item indices are factorized into dense integer codes (a missing child gets code -1).
+      - The children of each parent are stored contiguously (CSR layout: 'indptr', 'child', 'qty'),
+        in the same order as the rows of the BOM sheet.
+    """
+
+    def __init__(self, bom):
+        parent_col = bom['Parent Index'].reset_index(drop=True)
+        child_col = bom['Child Index'].reset_index(drop=True)
+        codes, self.items = pd.factorize(pd.concat([parent_col, child_col], ignore_index=True))
+        parent_codes = codes[:len(bom)]
+        child_codes = codes[len(bom):]
+
+        # Rows without a parent can never be reached, so they are left out of the index
+        has_parent = parent_codes >= 0
+        order = np.argsort(parent_codes[has_parent], kind='stable')
+        self.n_items = len(self.items)
+        self.child = child_codes[has_parent][order]
+        self.qty = bom['QTY Per'].to_numpy()[has_parent][order]
+        counts = np.bincount(parent_codes[has_parent], minlength=self.n_items)
+        self.indptr = np.concatenate(([0], np.cumsum(counts)))
+
+        self._build_lookups()
+        self._find_components()
+
+    def _build_lookups(self):
+        self._code_of = dict(zip(self.items.tolist(), range(self.n_items)))
+
+        # Plain-list copies for the explosion walk (scalar access on lists is much faster than on arrays)
+        self.indptr_list = self.indptr.tolist()
+        self.child_list = self.child.tolist()
+        self.qty_list = self.qty.tolist()
+        self.items_list = self.items.tolist()
+
+    def __getstate__(self):
+        # Only the compact arrays travel to worker processes; the lookups are rebuilt on arrival
+        return {key: value for key, value in self.__dict__.items()
+                if key not in ('_code_of', 'indptr_list', 'child_list', 'qty_list', 'items_list')}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_lookups()
+
+    def _find_components(self):
+        """
+        One pass over the whole BOM graph (iterative Tarjan) to find its strongly connected components:
+          - 'component' maps each item code to its component; components are numbered in reverse
+            topological order, so every component reachable from another is numbered before it.
+          - 'cyclic' flags the components that form a circular reference (several items, or a self-link).
+          - 'edge_in_cycle' flags the BOM lines that link two items of the same cyclic component.
+            Only those lines can ever close a circular reference during an explosion.
+          - 'acyclic' flags the items whose reachable sub-graph contains no circular reference at all.
+            Their explosion never depends on the path above them.
+        """
+        indptr, child, n_items = self.indptr_list, self.child_list, self.n_items
+        order = [-1] * n_items
+        low = [0] * n_items
+        component = [-1] * n_items
+        on_stack = bytearray(n_items)
+        stack = []
+        counter = 0
+        n_components = 0
+
+        for root in range(n_items):
+            if order[root] >= 0:
+                continue
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            work = [[root, indptr[root]]]
+            while work:
+                frame = work[-1]
+                node, pos, end = frame[0], frame[1], indptr[frame[0] + 1]
+                while pos < end:
+                    successor = child[pos]
+                    pos += 1
+                    if successor < 0:
+                        continue
+                    if order[successor] < 0:
+                        frame[1] = pos
+                        order[successor] = low[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack[successor] = 1
+                        work.append([successor, indptr[successor]])
+                        break
+                    if on_stack[successor] and order[successor] < low[node]:
+                        low[node] = order[successor]
+                else:
+                    work.pop()
+                    if low[node] == order[node]:
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = 0
+                            component[member] = n_components
+                            if member == node:
+                                break
+                        n_components += 1
+                    if work and low[node] < low[work[-1][0]]:
+                        low[work[-1][0]] = low[node]
+
+        self.component = np.asarray(component, dtype=np.int64)
+        edge_parent = np.repeat(np.arange(n_items), np.diff(self.indptr))
+        linked = self.child >= 0
+        same_component = np.zeros(len(self.child), dtype=bool)
+        same_component[linked] = self.component[edge_parent[linked]] == self.component[self.child[linked]]
+        sizes = np.bincount(self.component, minlength=n_components)
+        self.cyclic = sizes > 1
+        self.cyclic[self.component[edge_parent[same_component]]] = True
+        self.edge_in_cycle = bytearray(same_component)
+
+        # Components come out children-first, so one pass settles every item's 'acyclic' flag
+        acyclic = bytearray(n_items)
+        members = np.argsort(self.component, kind='stable').tolist()
+        cyclic = self.cyclic.tolist()
+        for node in members:
+            if not cyclic[component[node]]:
+                acyclic[node] = all(c < 0 or acyclic[c] for c in child[indptr[node]:indptr[node + 1]])
+        self.acyclic = acyclic
+
+    def cycles(self):
+        """Member items of every circular reference in the BOM, one list per group of items that reference each other."""
+        return [self.items[np.flatnonzero(self.component == comp)].tolist()
+                for comp in np.flatnonzero(self.cyclic)]
+
+    def circular_references(self, top_codes):
+        """
+        (Parent, Child) pairs of every BOM line inside a circular reference that can be reached from
+        the given items. This covers every link an explosion of those items may have to cut.
+        """
+        reached = set()
+        seen = set()
+        queue = [code for code in top_codes if code >= 0 and not self.acyclic[code]]
+        while queue:
+            node = queue.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            comp = int(self.component[node])
+            if self.cyclic[comp]:
+                reached.add(comp)
+            queue.extend(c for c in self.child_list[self.indptr_list[node]:self.indptr_list[node + 1]]
+                         if c >= 0 and not self.acyclic[c] and c not in seen)
+        if not reached:
+            return set()
+        edge_parent = np.repeat(np.arange(self.n_items), np.diff(self.indptr))
+        in_cycle = np.frombuffer(self.edge_in_cycle, dtype=bool)
+        in_cycle = in_cycle & np.isin(self.component[edge_parent], list(reached))
+        return set(zip(self.items[edge_parent[in_cycle]].tolist(), self.items[self.child[in_cycle]].tolist()))
+
+    def subgraph_hashes(self):
+        """
+        Content hash of every item's reachable sub-graph (items, BOM line order and QTY Per), as a list
+        indexed by item code. Two BOM sheets give an item the same hash only if its explosion is the same.
+        Items of one circular reference share the hash of the whole cycle plus their own item index.
+        """
+        indptr, child, qty, items = self.indptr_list, self.child_list, self.qty_list, self.items_list
+        component = self.component.tolist()
+        hashes = [None] * self.n_items
+
+        def lines(node, comp):
+            for pos in range(indptr[node], indptr[node + 1]):
+                c = child[pos]
+                inside = c >= 0 and component[c] == comp
+                yield f"{items[c] if c >= 0 else None!r}|{qty[pos]!r}|{'' if c < 0 or inside else hashes[c]}"
+
+        # Components are numbered children-first, so every outside child is hashed before its parents
+        members_by_component = np.split(np.argsort(self.component, kind='stable'),
+                                        np.cumsum(np.bincount(self.component))[:-1])
+        for comp, members in enumerate(members_by_component):
+            members = sorted(members.tolist(), key=lambda code: repr(items[code]))
+            content = hashlib.blake2b(digest_size=16)
+            for node in members:
+                content.update(f"{items[node]!r}:{';'.join(lines(node, comp))}\n".encode())
+            if len(members) == 1:
+                hashes[members[0]] = content.hexdigest()
+            else:
+                for node in members:
+                    hashes[node] = hashlib.blake2b(f"{items[node]!r}@{content.hexdigest()}".encode(),
+                                                   digest_size=16).hexdigest()
+        return hashes
+
+    def cycle_cuts(self):
+        """
+        Boolean mask over the BOM lines ('child' order) of the lines cut to break every circular reference:
+        the lines that point back to an item on the current path of a depth-first walk that starts from
+        the items no other item uses (as an explosion of those items would cut them).
+        """
+        cut = np.zeros(len(self.child), dtype=bool)
+        if not self.cyclic.any():
+            return cut
+        indptr, child, acyclic = self.indptr_list, self.child_list, self.acyclic
+        used = np.zeros(self.n_items, dtype=bool)
+        used[self.child[self.child >= 0]] = True
+        state = bytearray(self.n_items)  # 0 unseen, 1 on the path, 2 done
+
+        for root in np.concatenate((np.flatnonzero(~used), np.flatnonzero(used))).tolist():
+            if state[root] or acyclic[root]:
+                continue
+            state[root] = 1
+            work = [[root, indptr[root]]]
+            while work:
+                frame = work[-1]
+                node, pos, end = frame[0], frame[1], indptr[frame[0] + 1]
+                while pos < end:
+                    successor = child[pos]
+                    pos += 1
+                    # Sub-graphs without circular references have nothing to cut
+                    if successor < 0 or acyclic[successor]:
+                        continue
+                    if state[successor] == 1:
+                        cut[pos - 1] = True
+                    elif state[successor] == 0:
+                        frame[1] = pos
+                        state[successor] = 1
+                        work.append([successor, indptr[successor]])
+                        break
+                else:
+                    state[node] = 2
+                    work.pop()
+        return cut
+
+    def low_level_codes(self, cut=None):
+        """
+        Low-level code of every item code: the lowest level at which it appears in any BOM, i.e. the longest
+        chain of BOM lines leading to it (0 for items no other item uses). Lines flagged in 'cut'
+        (cycle_cuts() by default) are ignored, so every parent gets a lower code than its components.
+        """
+        cut = self.cycle_cuts() if cut is None else cut
+        edge_parent = np.repeat(np.arange(self.n_items), np.diff(self.indptr))
+        kept = (self.child >= 0) & ~cut
+        parents, children = edge_parent[kept], self.child[kept]
+        codes = np.zeros(self.n_items, dtype=np.int64)
+        # One relaxation per level: a component sits at least one level below each of its parents
+        while True:
+            lowered = codes.copy()
+            np.maximum.at(lowered, children, codes[parents] + 1)
+            if np.array_equal(lowered, codes):
+                return codes
+            codes = lowered
+
+    def qty_per_matrix(self, cut=None):
+        """
+        Sparse (parent x child) quantity-per matrix; repeated BOM lines for the same pair are summed.
+        BOM lines flagged in 'cut' (a mask such as cycle_cuts()) are left out.
+        """
+        edge_parent = np.repeat(np.arange(self.n_items), np.diff(self.indptr))
+        linked = self.child >= 0 if cut is None else (self.child >= 0) & ~cut
+        return sparse.csr_matrix(
+            (self.qty[linked].astype(float), (edge_parent[linked], self.child[linked])),
+            shape=(self.n_items, self.n_items))
+
+    def has_children(self, code):
+        return code >= 0 and self.indptr_list[code + 1] > self.indptr_list[code]
+
+    def code(self, item_index):
+        """Return the dense code of an item index, or -1 if the item is not in the BOM."""
+        return self._code_of.get(item_index, -1)
+
+    def decode(self, codes):
+        """Translate an array of dense codes back to item indices (-1 becomes NaN)."""
+        codes = np.asarray(codes, dtype=np.int64)
+        return pd.api.extensions.take(self.items.to_numpy(), codes, allow_fill=(codes < 0).any())
+
+
+class SubtreeBlock:
+    """
+    Exploded subtree of one subassembly, relative to the subassembly itself:
+      - 'level' is relative (0 for its direct components).
+      - 'parent_pos' is the position of each row's parent row inside the block (-1 for direct components),
+        so totals can be rebuilt for any parent quantity with the same multiplication chain as a full walk.
+    """
+
+    def __init__(self, level, parent, child, qty, parent_pos):
+        self.level = level
+        self.parent = parent
+        self.child = child
+        self.qty = qty
+        self.parent_pos = parent_pos
+        self.rows_by_level = [np.flatnonzero(level == depth) for depth in range(int(level.max()) + 1)]
+        self._lists = None
+
+    def __len__(self):
+        return len(self.child)
+
+    def lists(self):
+        """Plain-list copy of the block, used to stitch small blocks without array overhead."""
+        if self._lists is None:
+            self._lists = (self.level.tolist(), self.parent.tolist(), self.child.tolist(),
+                           self.qty.tolist(), self.parent_pos.tolist())
+        return self._lists
+
+    def totals(self, parent_qty):
+        """Total quantity of every row when the subassembly is required 'parent_qty' times."""
+        totals = np.empty(len(self), dtype=np.result_type(self.qty, parent_qty))
+        for depth, rows in enumerate(self.rows_by_level):
+            if depth == 0:
+                totals[rows] = self.qty[rows] * parent_qty
+            else:
+                totals[rows] = self.qty[rows] * totals[self.parent_pos[rows]]
+        return totals
+
+
+class HierarchyRows:
+    """
+    Column buffers for an explosion. Rows found by the walk are appended to plain lists;
+    memoized subtrees are stitched in as array chunks.
+    """
+
+    def __init__(self):
+        self.lists = tuple([] for _ in BOM_HIERARCHY_COLUMNS[1:])
+        self.chunks = []
+
+    def flush(self):
+        if self.lists[0]:
+            self.chunks.append(tuple(np.asarray(values) for values in self.lists))
+            for values in self.lists:
+                values.clear()
+
+    def add_block(self, production, level_offset, parent_qty, block, parent_row, start_row):
+        """
+        Stitch a memoized subtree in below a row of the same production item: 'parent_row' is the position
+        of that row (-1 when the block is the whole item) and 'start_row' the position of the block's first row.
+        """
+        if len(block) <= SMALL_BLOCK_ROWS:
+            # Rows are in pre-order, so each parent total is known before its children need it
+            level, parent, child, qty, parent_pos = block.lists()
+            block_totals = []
+            for q, pos in zip(qty, parent_pos):
+                block_totals.append(q * (parent_qty if pos < 0 else block_totals[pos]))
+            production_list, levels, parents, children, qty_per, totals, parent_rows = self.lists
+            production_list.extend([production] * len(level))
+            levels.extend([lv + level_offset for lv in level])
+            parents.extend(parent)
+            children.extend(child)
+            qty_per.extend(qty)
+            totals.extend(block_totals)
+            parent_rows.extend([parent_row if pos < 0 else pos + start_row for pos in parent_pos])
+            return
+        self.flush()
+        self.chunks.append((
+            np.full(len(block), production),
+            block.level + level_offset,
+            block.parent,
+            block.child,
+            block.qty,
+            block.totals(parent_qty),
+            np.where(block.parent_pos < 0, parent_row, block.parent_pos + start_row),
+        ))
+
+    def columns(self):
+        self.flush()
+        if not self.chunks:
+            return [np.array([], dtype=np.int64) for _ in self.lists]
+        return [np.concatenate(parts) for parts in zip(*self.chunks)]
 
-def check_for_circular_reference(path, component_index):
-    return component_index in path
-
-def build_indented_bom(bom, main_number, parent_index, level=0, parent_qty=1, bom_hierarchy=None, path=None, circular_references=None):
-    if bom_hierarchy is None:
-        bom_hierarchy = []
-    if path is None:
-        path = []
-    if circular_references is None:
-        circular_references = set()
-
-    # Track the current path
-    path.append(parent_index)
-    components = bom[bom['Parent Index'] == parent_index]
-
-    for _, component in components.iterrows():
-        component_index = component['Child Index']
-        # Avoid circular references
-        if check_for_circular_reference(path, component_index):
-            circular_references.add((parent_index, component_index))
+
+class BomExplosion:
+    """
+    Explosion state shared across all top-level items:
+      - The BOM index and the on-path flags used for circular reference checks.
+      - A memo of the exploded subtree of every subassembly that cannot reach a circular reference.
+        A subassembly under many finished goods is walked once and stitched in everywhere else
+        ('memo_hits' counts the reuses, 'memo_misses' the subtrees that had to be built).
+    """
+
+    def __init__(self, bom_index):
+        self.bom_index = bom_index
+        self.on_path = bytearray(bom_index.n_items)
+        self.memo = {}
+        self.memo_lookups = 0
+        self.memo_misses = 0
+
+    @property
+    def memo_hits(self):
+        return self.memo_lookups - self.memo_misses
+
+    def subtree(self, code):
+        """Return the memoized subtree of an acyclic subassembly, building any missing ones bottom-up."""
+        self.memo_lookups += 1
+        if code not in self.memo:
+            bom_index = self.bom_index
+            stack = [code]
+            while stack:
+                node = stack[-1]
+                if node in self.memo:
+                    stack.pop()
+                    continue
+                start, end = bom_index.indptr_list[node], bom_index.indptr_list[node + 1]
+                missing = [c for c in bom_index.child_list[start:end]
+                           if bom_index.has_children(c) and c not in self.memo]
+                if missing:
+                    stack.extend(missing)
+                else:
+                    stack.pop()
+                    self.memo[node] = self._build_subtree(node)
+                    self.memo_misses += 1
+        return self.memo[code]
+
+    def _build_subtree(self, code):
+        """Concatenate the direct components of 'code' with the memoized subtrees of its subassemblies."""
+        bom_index = self.bom_index
+        start, end = bom_index.indptr_list[code], bom_index.indptr_list[code + 1]
+        levels, parents, children, qtys, parent_pos = [], [], [], [], []
+        n_rows = 0
+
+        def add_components(first, last):
+            count = last - first
+            levels.append(np.zeros(count, dtype=np.int64))
+            parents.append(np.full(count, code))
+            children.append(bom_index.child[first:last])
+            qtys.append(bom_index.qty[first:last])
+            parent_pos.append(np.full(count, -1))
+            return count
+
+        run_start = start
+        for pos in range(start, end):
+            component = bom_index.child_list[pos]
+            if not bom_index.has_children(component):
+                continue
+            n_rows += add_components(run_start, pos + 1)
+            sub = self.memo[component]
+            self.memo_lookups += 1
+            levels.append(sub.level + 1)
+            parents.append(sub.parent)
+            children.append(sub.child)
+            qtys.append(sub.qty)
+            parent_pos.append(np.where(sub.parent_pos < 0, n_rows - 1, sub.parent_pos + n_rows))
+            n_rows += len(sub)
+            run_start = pos + 1
+        if run_start < end:
+            add_components(run_start, end)
+
+        return SubtreeBlock(np.concatenate(levels), np.concatenate(parents), np.concatenate(children),
+                            np.concatenate(qtys), np.concatenate(parent_pos))
+
+
+def build_indented_bom(explosion, main_number, rows):
+    """
+    Explode one production item into 'rows' by walking the BOM index depth-first with an explicit
+    stack, so deep BOMs are not limited by Python's recursion limit. Rows come out in the same
+    pre-order as a recursive walk over the BOM sheet. A child that is already on the current path
+    is a circular reference and is not expanded; only BOM lines inside a cycle found by the
+    component pre-pass need that check. Subassemblies that cannot reach a circular reference are
+    stitched in from the memo instead of being walked again.
+    """
+    bom_index = explosion.bom_index
+    top = bom_index.code(main_number)
+    if not bom_index.has_children(top):
+        return rows
+    if bom_index.acyclic[top]:
+        rows.add_block(top, 0, 1, explosion.subtree(top), -1, 0)
+        return rows
+
+    indptr = bom_index.indptr_list
+    child = bom_index.child_list
+    qty = bom_index.qty_list
+    in_cycle = bom_index.edge_in_cycle
+    acyclic = bom_index.acyclic
+    on_path = explosion.on_path
+    production, levels, parents, children, qty_per, totals, parent_rows = rows.lists
+    n_rows = 0
+
+    # Each stack frame is [item code, next edge position, quantity of the item, level of its children,
+    # position of the item's own row]
+    stack = [[top, indptr[top], 1, 0, -1]]
+    on_path[top] = 1
+    while stack:
+        frame = stack[-1]
+        parent, pos = frame[0], frame[1]
+        if pos == indptr[parent + 1]:
+            on_path[parent] = 0
+            stack.pop()
             continue
+        frame[1] = pos + 1
 
-        component_total_qty = component['QTY Per'] * parent_qty
-        bom_hierarchy.append({
-            'Production Index': main_number,
-            'Level': level,
-            'Parent Index': parent_index,
-            'Child Index': component_index,
-            'QTY Per': component['QTY Per'],
-            'Total Quantity': component_total_qty
-        })
+        component = child[pos]
+        if in_cycle[pos] and on_path[component]:
+            continue
 
-        # Recursively process subcomponents
-        if bom['Parent Index'].eq(component_index).any():
-            build_indented_bom(bom, main_number, component_index, level + 1, component_total_qty, bom_hierarchy, path, circular_references)
-    path.pop()
-    return bom_hierarchy, circular_references
+        component_total_qty = qty[pos] * frame[2]
+        production.append(top)
+        levels.append(frame[3])
+        parents.append(parent)
+        children.append(component)
+        qty_per.append(qty[pos])
+        totals.append(component_total_qty)
+        parent_rows.append(frame[4])
+        component_row = n_rows
+        n_rows += 1
+
+        # Descend into subcomponents, or stitch them in from the memo when the subtree is acyclic
+        if component >= 0 and indptr[component + 1] > indptr[component]:
+            if acyclic[component]:
+                block = explosion.subtree(component)
+                rows.add_block(top, frame[3] + 1, component_total_qty, block, component_row, n_rows)
+                n_rows += len(block)
+            else:
+                on_path[component] = 1
+                stack.append([component, indptr[component], component_total_qty, frame[3] + 1, component_row])
+    return rows
+
+
+def report_circular_references(bom_index):
+    """Print the member items of every circular reference found by the component pre-pass."""
+    cycles = bom_index.cycles()
+    if cycles:
+        print(f"Found {len(cycles)} circular reference(s) in the BOM:")
+        for members in cycles:
+            print(f"  {', '.join(str(member) for member in members)}")
+
+
+# Index shared with every explosion worker once, when the worker process starts
+_worker_bom_index = None
 
-def create_bom_hierarchy(bom_data, top_level_indices):
-    bom_hierarchy_list = []
-    circular_references_set = set()
-    processed_indices = set()
 
+def _init_explosion_worker(bom_index):
+    global _worker_bom_index
+    _worker_bom_index = bom_index
+
+
+def _explode_shard(top_level_indices, bom_index=None):
+    """Explode a run of distinct top-level items; returns the hierarchy columns and the memo counters."""
+    explosion = BomExplosion(bom_index if bom_index is not None else _worker_bom_index)
+    rows = HierarchyRows()
     for index in top_level_indices:
-        if index not in processed_indices:
-            hierarchy, circular_refs = build_indented_bom(bom_data, index, index)
-            bom_hierarchy_list.extend(hierarchy)
-            circular_references_set.update(circular_refs)
-            processed_indices.add(index)
-
-    # Convert the list into a DataFrame and add an order column
-    bom_hierarchy_df = pd.DataFrame(bom_hierarchy_list)
+        build_indented_bom(explosion, index, rows)
+    return rows.columns(), explosion.memo_lookups, explosion.memo_misses
+
+
+def explode_items(bom_index, top_level_indices, workers=BOM_EXPLOSION_WORKERS):
+    """
+    Explode each distinct item of 'top_level_indices' (in order of first appearance) and return the
+    hierarchy DataFrame, without the 'Order' column.
+    With more than one worker, the items are split into contiguous shards exploded in a process pool.
+    The BOM index is sent to each worker once, and shards are merged back in order, so the rows come
+    out exactly as in a serial explosion.
+    """
+    top_indices = list(dict.fromkeys(top_level_indices))
+    if workers > 1 and len(top_indices) > 1:
+        # A few shards per worker keeps the pool busy when some items explode much larger than others
+        shard_size = -(-len(top_indices) // (workers * 4))
+        shards = [top_indices[i:i + shard_size] for i in range(0, len(top_indices), shard_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_explosion_worker,
+                                 initargs=(bom_index,)) as pool:
+            results = list(pool.map(_explode_shard, shards))
+    else:
+        results = [_explode_shard(top_indices, bom_index)]
+
+    memo_lookups = sum(result[1] for result in results)
+    memo_misses = sum(result[2] for result in results)
+    print(f"BOM explosion: {memo_lookups - memo_misses} subassembly memo hits, {memo_misses} misses.")
+
+    # Translate the codes back to item indices
+    production, levels, parents, children, qty_per, totals, parent_rows = (
+        np.concatenate(parts) for parts in zip(*(result[0] for result in results)))
+    return pd.DataFrame({
+        'Production Index': bom_index.decode(production),
+        'Level': levels.astype(np.int64),
+        'Parent Index': bom_index.decode(parents),
+        'Child Index': bom_index.decode(children),
+        'QTY Per': qty_per.astype(bom_index.qty.dtype),
+        'Total Quantity': totals,
+        'Parent Row': parent_rows.astype(np.int64),
+    })
+
+
+def create_bom_hierarchy(bom_data, top_level_indices):
+    stage = start_stage('explosion', rows_in=len(bom_data))
+    bom_index = BomIndex(bom_data)
+    # Circular references are found once, over the whole BOM graph, before any explosion
+    report_circular_references(bom_index)
+
+    bom_hierarchy_df = explode_items(bom_index, top_level_indices)
     bom_hierarchy_df.insert(0, 'Order', range(1, len(bom_hierarchy_df) + 1))
-    bom_hierarchy_df.reset_index(drop=True, inplace=True)
+    bom_hierarchy_df = apply_dtype_plan(bom_hierarchy_df)
+    circular_references_set = bom_index.circular_references([bom_index.code(index) for index in top_level_indices])
+    stage.finish(rows_out=len(bom_hierarchy_df), frames=[bom_hierarchy_df])
     return bom_hierarchy_df, circular_references_set
 
+
+def create_bom_rollup(bom_data, top_level_indices):
+    """
+    Total gross quantity of every component per production item, without building the indented tree:
+      - The BOM is treated as a sparse quantity-per matrix A (parent x child).
+      - Requirements are accumulated level by level: R1 = A[items], R(k+1) = R(k) @ A, total = R1 + R2 + ...
+      - Items whose sub-graph reaches a circular reference are exploded instead and summed, so their
+        totals skip the same circular references as create_bom_hierarchy.
+    Returns a DataFrame with 'Production Index', 'Child Index' and 'Total Quantity'.
+    """
+    bom_index = BomIndex(bom_data)
+    top_codes = []
+    for index in top_level_indices:
+        code = bom_index.code(index)
+        if bom_index.has_children(code) and code not in top_codes:
+            top_codes.append(code)
+    top_codes = np.asarray(top_codes, dtype=np.int64)
+    is_acyclic = np.frombuffer(bom_index.acyclic, dtype=bool)[top_codes]
+
+    # --- Acyclic items: repeated sparse products until no requirement is left ---
+    qty_per = bom_index.qty_per_matrix()
+    acyclic_positions = np.flatnonzero(is_acyclic)
+    frontier = qty_per[top_codes[acyclic_positions]]
+    total = frontier.copy()
+    while frontier.nnz:
+        frontier = frontier @ qty_per
+        total = total + frontier
+    total = total.tocoo()
+    parts = [pd.DataFrame({
+        'Position': acyclic_positions[total.row],
+        'Child Code': total.col,
+        'Total Quantity': total.data,
+    })]
+
+    # --- Items reaching a circular reference: explode and sum ---
+    cyclic_positions = np.flatnonzero(~is_acyclic)
+    if len(cyclic_positions):
+        explosion = BomExplosion(bom_index)
+        rows = HierarchyRows()
+        for position in cyclic_positions:
+            build_indented_bom(explosion, bom_index.items_list[top_codes[position]], rows)
+        production, _, _, children, _, totals, _ = rows.columns()
+        position_of = np.full(bom_index.n_items, -1)
+        position_of[top_codes] = np.arange(len(top_codes))
+        exploded = pd.DataFrame({
+            'Position': position_of[production],
+            'Child Code': children,
+            'Total Quantity': totals.astype(float),
+        })
+        parts.append(exploded[exploded['Child Code'] >= 0]
+                     .groupby(['Position', 'Child Code'], as_index=False)['Total Quantity'].sum())
+
+    rollup = pd.concat(parts, ignore_index=True).sort_values(['Position', 'Child Code'], ignore_index=True)
+    return apply_dtype_plan(pd.DataFrame({
+        'Production Index': bom_index.decode(top_codes[rollup['Position'].to_numpy()]),
+        'Child Index': bom_index.decode(rollup['Child Code'].to_numpy()),
+        'Total Quantity': rollup['Total Quantity'].to_numpy(),
+    }))
+
+
 def save_bom_index(bom_hierarchy_df, output_file):
-    bom_hierarchy_df.to_excel(output_file, index=False)
+    return write_table(bom_hierarchy_df.drop(columns='Parent Row'), output_file)
+
+
+def save_bom_rollup(bom_rollup_df, output_file):
+    return write_table(bom_rollup_df, output_file)
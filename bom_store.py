@@ -0,0 +1,131 @@
+# bom_store.py
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from bom_explosion import BOM_HIERARCHY_COLUMNS, BomIndex, explode_items, report_circular_references
+from config import BOM_STORE_FILE
+from dtype_plan import apply_dtype_plan
+from instrumentation import start_stage
+
+# Bump when the layout of the stored rows changes; a store written in another format is rebuilt
+STORE_FORMAT = 2
+
+STORE_COLUMNS = {
+    'Production Index': 'production_index',
+    'Level': 'level',
+    'Parent Index': 'parent_index',
+    'Child Index': 'child_index',
+    'QTY Per': 'qty_per',
+    'Total Quantity': 'total_quantity',
+    'Parent Row': 'parent_row',
+}
+
+
+def open_store(store_file=BOM_STORE_FILE):
+    """
+    Open (and create if needed) the SQLite store of exploded BOMs:
+      - 'exploded_items' holds one entry per production index with the hash of its reachable sub-graph.
+      - 'exploded_rows' holds the exploded rows of every entry, in explosion order ('row_no').
+    """
+    conn = sqlite3.connect(store_file)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != STORE_FORMAT:
+        conn.executescript("DROP TABLE IF EXISTS exploded_items; DROP TABLE IF EXISTS exploded_rows;")
+        conn.execute(f"PRAGMA user_version = {STORE_FORMAT}")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS exploded_items (
+            production_index PRIMARY KEY,
+            subgraph_hash TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS exploded_rows (
+            production_index,
+            row_no INTEGER,
+            level INTEGER,
+            parent_index,
+            child_index,
+            qty_per REAL,
+            total_quantity REAL,
+            parent_row INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS exploded_rows_item ON exploded_rows (production_index, row_no);
+    """)
+    return conn
+
+
+def _fill_temp_table(conn, name, values):
+    conn.execute(f"DROP TABLE IF EXISTS temp.{name}")
+    conn.execute(f"CREATE TEMP TABLE {name} (production_index PRIMARY KEY)")
+    conn.executemany(f"INSERT INTO temp.{name} VALUES (?)", [(value,) for value in values])
+
+
+def read_stored_rows(conn, production_indices):
+    """Read the stored rows of the given production indices."""
+    _fill_temp_table(conn, 'wanted', production_indices)
+    stored = pd.read_sql_query(
+        "SELECT r.* FROM exploded_rows r JOIN temp.wanted w USING (production_index) "
+        "ORDER BY r.production_index, r.row_no", conn)
+    return stored.drop(columns='row_no').rename(columns={v: k for k, v in STORE_COLUMNS.items()})
+
+
+def write_stored_rows(conn, exploded_df, hashes):
+    """Replace the stored entries of every production index in 'hashes' with the rows of 'exploded_df'."""
+    _fill_temp_table(conn, 'stale', hashes)
+    with conn:
+        conn.execute("DELETE FROM exploded_rows WHERE production_index IN (SELECT production_index FROM temp.stale)")
+        conn.executemany("INSERT OR REPLACE INTO exploded_items VALUES (?, ?)", list(hashes.items()))
+        rows = exploded_df.rename(columns=STORE_COLUMNS)
+        rows.insert(1, 'row_no', rows.groupby('production_index').cumcount())
+        rows.to_sql('exploded_rows', conn, if_exists='append', index=False)
+
+
+def create_bom_hierarchy_from_store(bom_data, top_level_indices, store_file=BOM_STORE_FILE):
+    """
+    Same result as create_bom_hierarchy, but exploded hierarchies are persisted in an SQLite store keyed by
+    production index. Each entry carries the content hash of the item's reachable sub-graph, so only the
+    items whose sub-graph changed since the last run are re-exploded; the rest are read back from the store.
+    """
+    stage = start_stage('explosion', rows_in=len(bom_data))
+    bom_index = BomIndex(bom_data)
+    report_circular_references(bom_index)
+
+    # Items without a BOM explode to nothing, so they are neither stored nor looked up
+    top_indices = [index for index in dict.fromkeys(top_level_indices) if bom_index.has_children(bom_index.code(index))]
+    hashes = bom_index.subgraph_hashes()
+    current = {index: hashes[bom_index.code(index)] for index in top_indices}
+
+    conn = open_store(store_file)
+    try:
+        stored = dict(conn.execute("SELECT production_index, subgraph_hash FROM exploded_items").fetchall())
+        fresh = [index for index in top_indices if stored.get(index) == current[index]]
+        stale = [index for index in top_indices if stored.get(index) != current[index]]
+        print(f"Exploded BOM store: {len(fresh)} item(s) reused, {len(stale)} re-exploded.")
+
+        parts = []
+        if fresh:
+            parts.append(read_stored_rows(conn, fresh))
+        if stale:
+            exploded_df = explode_items(bom_index, stale)
+            write_stored_rows(conn, exploded_df, {index: current[index] for index in stale})
+            parts.append(exploded_df)
+    finally:
+        conn.close()
+
+    # Put every item's rows back in top-level order (the sort is stable, so rows keep explosion order)
+    if parts:
+        bom_hierarchy_df = pd.concat(parts, ignore_index=True)
+    else:
+        bom_hierarchy_df = pd.DataFrame(columns=BOM_HIERARCHY_COLUMNS[1:])
+    position = {index: i for i, index in enumerate(top_indices)}
+    bom_hierarchy_df = bom_hierarchy_df.iloc[
+        np.argsort(bom_hierarchy_df['Production Index'].map(position).to_numpy(), kind='stable')
+    ].reset_index(drop=True)
+    bom_hierarchy_df['QTY Per'] = bom_hierarchy_df['QTY Per'].astype(bom_index.qty.dtype)
+    bom_hierarchy_df['Total Quantity'] = bom_hierarchy_df['Total Quantity'].astype(
+        np.result_type(bom_index.qty.dtype, np.int64))
+
+    circular_references_set = bom_index.circular_references([bom_index.code(index) for index in top_indices])
+    bom_hierarchy_df.insert(0, 'Order', range(1, len(bom_hierarchy_df) + 1))
+    bom_hierarchy_df = apply_dtype_plan(bom_hierarchy_df)
+    stage.finish(rows_out=len(bom_hierarchy_df), frames=[bom_hierarchy_df])
+    return bom_hierarchy_df, circular_references_set
@@ -11,8 +11,57 @@ PURCHASES_SHEET = "Purchases"
 # Output file names
 OUTPUT_BOM_INDEX = "Fully Blown Out BOM Index.xlsx"
 OUTPUT_BOM_ITEM = "Fully Blown Out BOM Item.xlsx"
+OUTPUT_BOM_ROLLUP = "BOM Gross Requirements Rollup.xlsx"
 OUTPUT_NET_REQ = "Final_Net_Requirements_Based_on_Inventory.xlsx"
 OUTPUT_UPDATED_INV = "Updated_Inventory.xlsx"
+OUTPUT_ITEM_PRICES = "Vendor_Item_Average_Unit_Prices.xlsx"
+OUTPUT_MRP_PLAN = "MRP_Plan_by_Low_Level_Code.xlsx"
+
+# Format of the output files: "xlsx" (streamed, split into sheets of MAX_ROWS_PER_CHUNK rows),
+# "parquet" or "csv" (the extension of the names above is replaced accordingly)
+OUTPUT_FORMAT = "xlsx"
+
+# Number of worker processes for BOM explosion (1 explodes serially in the main process)
+BOM_EXPLOSION_WORKERS = 1
+
+# Persistent store of exploded BOMs (set USE_BOM_STORE to False to always explode from scratch)
+USE_BOM_STORE = True
+BOM_STORE_FILE = "Exploded BOM Store.sqlite"
+
+# Parquet snapshots of the workbook sheets, reused until the workbook changes
+# (manage with "python data_loader.py warm|invalidate")
+USE_SNAPSHOT_CACHE = True
+SNAPSHOT_CACHE_DIR = "Snapshot Cache"
+
+# Concurrent queries of the database-to-MRP pipeline (db_pipeline.py)
+DB_EXTRACTION_WORKERS = 5
+
+# Results kept per pipeline stage by the Streamlit dashboard's caches
+DASHBOARD_CACHE_ENTRIES = 4
+
+# Store pipeline columns in the compact dtypes of dtype_plan.DTYPE_PLAN (int32 indices, int8 levels,
+# categorical transaction types and documents, datetime64 dates)
+COMPACT_DTYPES = True
+
+# Where a component takes its parent's Stock Ratio from in per-order netting: "first match" uses the first
+# row of the order whose item is the component's parent item (the original lookup); "parent row" uses the
+# component's own parent row from the explosion, which only differs when a subassembly appears more than
+# once in a production tree
+PARENT_RATIO_LOOKUP = "first match"
+
+# Planning buckets for netting: None nets every sales / purchase document separately (detailed pegging);
+# "day", "week" or "month" aggregates demand and receipts per item and bucket before netting
+PLANNING_BUCKET = None
+
+# Netting engine of main.py: "order" explodes and nets every sales order (pegged to its documents);
+# "llc" nets each item's time-phased requirements once, level by level by low-level code (mrp_engine.py)
+NETTING_ENGINE = "order"
+
+# Structured report of each run (stage wall/CPU time, rows, memory), written by main.py and db_pipeline.py
+RUN_REPORT_FILE = "Run_Report.json"
+# Stage to profile with cProfile, e.g. "netting" (writes "Profile - netting.prof"); None profiles nothing.
+# Stages: load, explosion, netting, item mapping, export (and extraction in db_pipeline.py)
+PROFILE_STAGE = None
 
 # Other constants
-MAX_ROWS_PER_CHUNK = 500000
+MAX_ROWS_PER_CHUNK = 500000  # Rows per sheet / write chunk of the output files
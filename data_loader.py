@@ -1,6 +1,16 @@
 # data_loader.py
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
 import pandas as pd
 from config import EXCEL_FILE, BOM_SHEET, SALES_ORDERS_SHEET, INVENTORY_SHEET, ITEM_TABLE_SHEET, PURCHASES_SHEET
+from config import USE_SNAPSHOT_CACHE, SNAPSHOT_CACHE_DIR
+from dtype_plan import apply_dtype_plan
+from instrumentation import start_stage
+from item_mapping import ItemLookup
 
 def load_bom_data():
     try:
@@ -42,3 +52,191 @@ def load_purchases():
     except Exception as e:
         print(f"Error loading Purchases: {e}")
         return None
+
+# --- Single-pass workbook loading ---
+
+# Columns each sheet is restricted to when the whole workbook is loaded at once.
+# The Inventory sheet is read in full, since every column is carried into Updated_Inventory.xlsx.
+SHEET_COLUMNS = {
+    BOM_SHEET: ['Parent', 'Child', 'Total'],
+    SALES_ORDERS_SHEET: ['Index', 'QTY', 'Date', 'Document No_'],
+    INVENTORY_SHEET: None,
+    ITEM_TABLE_SHEET: ['Item Index', 'No_', 'Rev #'],
+    PURCHASES_SHEET: ['Index', 'QTY', 'Expected Receipt Date', 'Document No_'],
+}
+
+
+class MrpData:
+    """
+    All sheets of the MRP workbook needed by the pipeline, parsed once:
+      - 'bom' has its columns renamed as load_bom_data does.
+      - 'sales_orders' keeps every order line; top_level_indices() gives the de-duplicated items.
+    Consumers must not modify the frames in place, since every stage shares them.
+    """
+
+    def __init__(self, bom, sales_orders, inventory, item_table, purchases):
+        self.bom = bom
+        self.sales_orders = sales_orders
+        self.inventory = inventory
+        self.item_table = item_table
+        self.purchases = purchases
+
+    def item_lookup(self):
+        """The ItemLookup of the Item Table, built on first use."""
+        if getattr(self, '_item_lookup', None) is None:
+            self._item_lookup = ItemLookup(self.item_table)
+        return self._item_lookup
+
+    def frames(self):
+        return [self.bom, self.sales_orders, self.inventory, self.item_table, self.purchases]
+
+    def top_level_indices(self):
+        """Sales order items, once each, in order of first appearance."""
+        return self.sales_orders.drop_duplicates(subset='Index')['Index'].tolist()
+
+
+def parse_workbook(excel_file=EXCEL_FILE):
+    """Open the workbook once and parse every sheet in SHEET_COLUMNS, restricted to its columns."""
+    sheets = {}
+    with pd.ExcelFile(excel_file) as workbook:
+        for sheet_name, columns in SHEET_COLUMNS.items():
+            usecols = None if columns is None else (lambda column, wanted=columns: column in wanted)
+            sheets[sheet_name] = workbook.parse(sheet_name, usecols=usecols)
+    return sheets
+
+
+# --- Columnar snapshot cache ---
+# Each workbook gets a folder under SNAPSHOT_CACHE_DIR holding one Parquet file per sheet and a manifest
+# with the workbook's size, mtime and content hash. A snapshot is used while the workbook is unchanged:
+#   - Same size and mtime: used without reading the workbook.
+#   - Otherwise the workbook is hashed; the same content (e.g. the file was only re-saved or copied) reuses
+#     the snapshot, anything else re-parses the workbook and rewrites the snapshot.
+
+def snapshot_dir(excel_file):
+    return os.path.join(SNAPSHOT_CACHE_DIR, os.path.splitext(os.path.basename(excel_file))[0])
+
+
+def workbook_hash(excel_file):
+    """Content hash of the workbook file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(excel_file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(cache_dir, manifest):
+    with open(os.path.join(cache_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_snapshot(excel_file):
+    """The cached sheets of the workbook, or None if there is no snapshot of its current content."""
+    cache_dir = snapshot_dir(excel_file)
+    manifest = _read_manifest(cache_dir)
+    if manifest is None or manifest.get('columns') != SHEET_COLUMNS:
+        return None
+    stat = os.stat(excel_file)
+    if (manifest['size'], manifest['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+        if manifest['hash'] != workbook_hash(excel_file):
+            return None
+        manifest['size'], manifest['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+        _write_manifest(cache_dir, manifest)
+    try:
+        return {sheet_name: pd.read_parquet(os.path.join(cache_dir, file_name))
+                for sheet_name, file_name in manifest['sheets'].items()}
+    except Exception as e:
+        print(f"Ignoring unreadable snapshot of '{excel_file}': {e}")
+        return None
+
+
+def save_snapshot(excel_file, sheets):
+    """Write the parsed sheets as the workbook's snapshot (replacing any previous one)."""
+    cache_dir = snapshot_dir(excel_file)
+    invalidate_snapshot(excel_file)
+    os.makedirs(cache_dir)
+    stat = os.stat(excel_file)
+    manifest = {
+        'workbook': os.path.abspath(excel_file),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': workbook_hash(excel_file),
+        'columns': SHEET_COLUMNS,
+        'sheets': {},
+    }
+    try:
+        for i, (sheet_name, df) in enumerate(sheets.items()):
+            file_name = f"sheet_{i}.parquet"
+            df.to_parquet(os.path.join(cache_dir, file_name))
+            manifest['sheets'][sheet_name] = file_name
+    except Exception as e:
+        # e.g. a column mixing numbers and text, which Parquet cannot store
+        print(f"Could not snapshot '{excel_file}': {e}")
+        invalidate_snapshot(excel_file)
+        return False
+    # The manifest is written last, so an interrupted write leaves no usable snapshot behind
+    _write_manifest(cache_dir, manifest)
+    return True
+
+
+def invalidate_snapshot(excel_file):
+    """Remove the workbook's snapshot, if any."""
+    shutil.rmtree(snapshot_dir(excel_file), ignore_errors=True)
+
+
+def load_workbook_data(excel_file=EXCEL_FILE, use_cache=USE_SNAPSHOT_CACHE):
+    """
+    Load all sheets used by the pipeline, restricted to the columns in SHEET_COLUMNS:
+      - From the workbook's snapshot if it is current (and use_cache is set).
+      - Otherwise by opening the workbook once and parsing them in a single pass (refreshing the snapshot).
+    The frames are converted to the compact dtypes of dtype_plan.
+    Returns an MrpData bundle, or None if the workbook cannot be loaded.
+    """
+    stage = start_stage('load')
+    try:
+        sheets = load_snapshot(excel_file) if use_cache else None
+        if sheets is None:
+            sheets = parse_workbook(excel_file)
+            if use_cache and save_snapshot(excel_file, sheets):
+                print(f"Snapshot of '{excel_file}' saved to '{snapshot_dir(excel_file)}'.")
+        else:
+            print(f"Loaded '{excel_file}' from its snapshot.")
+    except Exception as e:
+        print(f"Error loading workbook '{excel_file}': {e}")
+        stage.finish(rows_out=0, failed=True)
+        return None
+
+    bom_data = sheets[BOM_SHEET].rename(columns={'Parent': 'Parent Index', 'Child': 'Child Index', 'Total': 'QTY Per'})
+    mrp_data = MrpData(
+        bom=apply_dtype_plan(bom_data),
+        sales_orders=apply_dtype_plan(sheets[SALES_ORDERS_SHEET]),
+        inventory=apply_dtype_plan(sheets[INVENTORY_SHEET]),
+        item_table=apply_dtype_plan(sheets[ITEM_TABLE_SHEET]),
+        purchases=apply_dtype_plan(sheets[PURCHASES_SHEET]),
+    )
+    stage.finish(rows_out=sum(len(df) for df in mrp_data.frames()), frames=mrp_data.frames())
+    return mrp_data
+
+
+if __name__ == "__main__":
+    # python data_loader.py warm|invalidate [workbook]
+    parser = argparse.ArgumentParser(description="Manage the columnar snapshot cache of the MRP workbook.")
+    parser.add_argument('action', choices=['warm', 'invalidate'],
+                        help="'warm' (re)builds the snapshot if the workbook changed; 'invalidate' deletes it")
+    parser.add_argument('workbook', nargs='?', default=EXCEL_FILE)
+    args = parser.parse_args()
+
+    if args.action == 'warm':
+        if load_workbook_data(args.workbook, use_cache=True) is not None:
+            print(f"Snapshot of '{args.workbook}' is up to date.")
+    else:
+        invalidate_snapshot(args.workbook)
+        print(f"Snapshot of '{args.workbook}' removed.")
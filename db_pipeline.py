@@ -0,0 +1,198 @@
+# db_pipeline.py
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# The extractors live in 'Raw Data' (not a package, as the folder name has a space)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Raw Data'))
+from db_extract import dispose_engine, load_and_process_table  # noqa: E402
+from item_data import item_query  # noqa: E402
+from BOM_data import bom_query  # noqa: E402
+from inventory_data import inventory_query  # noqa: E402
+from sales_data import sales_query  # noqa: E402
+from open_purchase_data import grouped_query  # noqa: E402
+from price_cube import PRICE_WINDOW_MONTHS, average_unit_prices  # noqa: E402
+
+from data_loader import MrpData  # noqa: E402
+from dtype_plan import apply_dtype_plan  # noqa: E402
+from instrumentation import start_run, finish_run, start_stage  # noqa: E402
+from bom_explosion import create_bom_hierarchy  # noqa: E402
+from bom_store import create_bom_hierarchy_from_store  # noqa: E402
+from inventory_management import process_transactions  # noqa: E402
+from output_sinks import write_table  # noqa: E402
+from config import USE_BOM_STORE, DB_EXTRACTION_WORKERS, OUTPUT_ITEM_PRICES  # noqa: E402
+
+# The queries run by the pipeline (the ones of the Raw Data extractors)
+EXTRACTION_QUERIES = {
+    'items': item_query,
+    'bom': bom_query,
+    'inventory': inventory_query,
+    'sales': sales_query,
+    'open_purchases': grouped_query,
+}
+
+def _timed_query(query):
+    start = time.perf_counter()
+    df = load_and_process_table(query=query)
+    return df, time.perf_counter() - start
+
+
+def extract_all(queries=None, workers=DB_EXTRACTION_WORKERS):
+    """
+    Run the extraction queries ({name: SQL}, the extractors' queries by default) concurrently in a thread pool
+    (sharing the pooled engine). Prints the row count and duration of each query.
+    Returns {name: DataFrame}, or None if any query failed.
+    """
+    queries = queries or EXTRACTION_QUERIES
+    stage = start_stage('extraction')
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {name: pool.submit(_timed_query, query) for name, query in queries.items()}
+        results = {name: future.result() for name, future in futures.items()}
+
+    print("Extraction timing:")
+    for name, (df, seconds) in results.items():
+        rows = "failed" if df is None else f"{len(df)} rows"
+        print(f"  {name}: {rows} in {seconds:.2f}s")
+    print(f"  total (concurrent): {time.perf_counter() - start:.2f}s")
+
+    frames = {name: df for name, (df, _) in results.items() if df is not None}
+    failed = len(frames) < len(results)
+    stage.finish(rows_out=sum(len(df) for df in frames.values()), frames=list(frames.values()), failed=failed)
+    return None if failed else frames
+
+
+def _map_items(df, column, item_index, source):
+    """Item Index of each row's item number; rows whose item is not in the item table are dropped."""
+    indices = df[column].map(item_index)
+    unknown = indices.isna()
+    if unknown.any():
+        print(f"Dropping {unknown.sum()} {source} row(s) with items missing from the item table.")
+    return indices[~unknown].astype('int64'), ~unknown
+
+
+def _one_bom_version(bom, indexed_revision):
+    """
+    The BOM lines of one Version Code per parent, so the versions of a parent are not merged into one BOM:
+    the version of the parent's indexed revision ('indexed_revision', by item number) if it has lines,
+    else the lowest Version Code listed.
+    """
+    versions = bom['Version Code'].fillna('').astype(str)
+    preferred = versions == bom['Production BOM No_'].map(indexed_revision).fillna('').astype(str)
+    keys = pd.DataFrame({'parent': bom['Production BOM No_'], 'preferred': preferred, 'version': versions})
+    chosen = keys.sort_values(['parent', 'preferred', 'version'], ascending=[True, False, True], kind='stable')
+    chosen = chosen.drop_duplicates(subset='parent')
+    keep = pd.MultiIndex.from_frame(keys[['parent', 'version']]).isin(
+        pd.MultiIndex.from_frame(chosen[['parent', 'version']]))
+    if not keep.all():
+        print(f"Dropping {(~keep).sum()} BOM line(s) of other versions of their parent's BOM.")
+    return bom[keep]
+
+
+def build_mrp_data(frames):
+    """
+    Turn the extracted frames into the MrpData bundle that data_loader builds from 'MRP Data.xlsx':
+      - The Item Table comes from item_data's ItemIndex, No_ and Rev#.
+      - Sales orders, inventory and purchases carry item numbers only, so every item number is given one
+        index: the ItemIndex of its first revision. BOM parents and children are mapped the same way.
+      - BOM lines of parents that are purchased in every revision are removed (as get_processed_bom_data does).
+      - As a parent number has a single index, only one version of its BOM is kept (see _one_bom_version).
+    """
+    items = frames['items'].sort_values('ItemIndex')
+    item_table = pd.DataFrame({'Item Index': items['ItemIndex'], 'No_': items['No_'], 'Rev #': items['Rev#']})
+    item_index = items.drop_duplicates(subset='No_').set_index('No_')['ItemIndex']
+
+    # --- BOM ---
+    made = set(items.loc[items['ReplenishmentAdjusted'] != 'Purchase', 'No_'])
+    purchased_only = set(items['No_']) - made
+    bom = frames['bom'][~frames['bom']['Production BOM No_'].isin(purchased_only)]
+    bom = _one_bom_version(bom, items.drop_duplicates(subset='No_').set_index('No_')['Rev#'])
+    parents = bom['Production BOM No_'].map(item_index)
+    children = bom['No_'].map(item_index)
+    known = parents.notna() & children.notna()
+    if (~known).any():
+        print(f"Dropping {(~known).sum()} BOM line(s) with items missing from the item table.")
+    bom_data = pd.DataFrame({
+        'Parent Index': parents[known].astype('int64'),
+        'Child Index': children[known].astype('int64'),
+        'QTY Per': bom.loc[known, 'Quantity per'].astype(float),
+    }).reset_index(drop=True)
+
+    # --- Sales Orders, Inventory and Purchases ---
+    sales = frames['sales']
+    index, known = _map_items(sales, 'No_', item_index, 'sales order')
+    sales_orders = pd.DataFrame({
+        'Index': index,
+        'QTY': sales.loc[known, 'QTY'],
+        'Date': pd.to_datetime(sales.loc[known, 'Date']),
+        'Document No_': sales.loc[known, 'Document No_'],
+    }).reset_index(drop=True)
+
+    inventory = frames['inventory']
+    index, known = _map_items(inventory, 'No_', item_index, 'inventory')
+    inventory_df = pd.DataFrame({'Index': index, 'Inventory': inventory.loc[known, 'Inventory']}).reset_index(drop=True)
+
+    purchases = frames['open_purchases']
+    index, known = _map_items(purchases, 'No_', item_index, 'open purchase')
+    purchases_df = pd.DataFrame({
+        'Index': index,
+        'QTY': purchases.loc[known, 'QTY'],
+        'Expected Receipt Date': pd.to_datetime(purchases.loc[known, 'Expected Receipt Date']),
+        'Document No_': purchases.loc[known, 'Document No_'],
+    }).reset_index(drop=True)
+
+    return MrpData(bom=apply_dtype_plan(bom_data), sales_orders=apply_dtype_plan(sales_orders),
+                   inventory=apply_dtype_plan(inventory_df), item_table=apply_dtype_plan(item_table),
+                   purchases=apply_dtype_plan(purchases_df))
+
+
+def save_price_report(months=PRICE_WINDOW_MONTHS):
+    """
+    Write the average unit price per vendor and item over the last 'months' months, read from the price cube
+    of the purchase store (kept up to date by purchase_sync.py). Skipped if the store has never been synced.
+    """
+    prices = average_unit_prices(months)
+    if prices is None:
+        print("No purchase store found; run 'Raw Data/purchase_sync.py' to add the unit price report.")
+        return None
+    return write_table(prices, OUTPUT_ITEM_PRICES)
+
+
+def run_pipeline(queries=None, workers=DB_EXTRACTION_WORKERS):
+    """
+    Run MRP straight from the database: extract concurrently, build the MRP data bundle,
+    explode the BOMs and net the transactions (writing the usual output files, plus the unit price report).
+    Returns the results of process_transactions, or None if the extraction failed.
+    """
+    # The run report is written even if a stage fails (its open stages are reported as failed), and the
+    # pooled database connections are closed either way
+    start_run('db_pipeline')
+    try:
+        frames = extract_all(queries, workers)
+        if frames is None:
+            print("Error extracting data from the database. Exiting.")
+            return None
+        with start_stage('load', rows_in=sum(len(df) for df in frames.values())) as stage:
+            mrp_data = build_mrp_data(frames)
+            stage.finish(rows_out=sum(len(df) for df in mrp_data.frames()), frames=mrp_data.frames())
+
+        top_level_indices = mrp_data.top_level_indices()
+        if USE_BOM_STORE:
+            bom_hierarchy_df, _ = create_bom_hierarchy_from_store(mrp_data.bom, top_level_indices)
+        else:
+            bom_hierarchy_df, _ = create_bom_hierarchy(mrp_data.bom, top_level_indices)
+        results = process_transactions(bom_hierarchy_df, mrp_data)
+        save_price_report()
+        return results
+    finally:
+        dispose_engine()
+        finish_run()
+
+
+if __name__ == '__main__':
+    # python db_pipeline.py   (set MRP_DB_URL to run against another database)
+    if run_pipeline() is not None:
+        print("Processing complete. Check output files for net requirements and updated inventory.")
@@ -0,0 +1,91 @@
+# dtype_plan.py
+import numpy as np
+import pandas as pd
+
+from config import COMPACT_DTYPES
+
+# Memory layout of the pipeline's columns, by name, applied from load through export:
+#   - 'index': item indices and row numbers as int32.
+#   - 'level': BOM levels as int8.
+#   - 'category': repetitive text (transaction types, document numbers) as categoricals.
+#   - 'datetime': dates as datetime64 (parsed from text, or from Excel serial day numbers).
+# Columns not listed (quantities, item numbers) keep their dtype.
+DTYPE_PLAN = {
+    'Order': 'index',
+    'Parent Order': 'index',
+    'Parent Row': 'index',
+    'Production Index': 'index',
+    'Parent Index': 'index',
+    'Child Index': 'index',
+    'Index': 'index',
+    'Item Index': 'index',
+    'Level': 'level',
+    'Low-Level Code': 'level',
+    'Transaction Type': 'category',
+    'Document No_': 'category',
+    'Date': 'datetime',
+    'Expected Receipt Date': 'datetime',
+}
+
+PLAN_INT_TYPES = {
+    'index': np.int32,
+    'level': np.int8,
+}
+
+
+def _downcast_int(values, dtype):
+    """The values as 'dtype' if that loses nothing (no missing, fractional or out-of-range values), else as is."""
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values) or values.dtype == dtype:
+        return values
+    array = values.to_numpy()
+    if array.dtype.kind == 'f' and not (np.isfinite(array).all() and (array == np.round(array)).all()):
+        return values
+    limits = np.iinfo(dtype)
+    if len(array) and (array.min() < limits.min or array.max() > limits.max):
+        return values
+    return values.astype(dtype)
+
+
+def _to_datetime(values):
+    """
+    The values as datetime64 if every present value parses as a date, else as is:
+      - Text (and Python dates) are parsed.
+      - Numbers are read as Excel serial day numbers (day 1 is 1900-01-01), not as epoch nanoseconds.
+      - Anything else (booleans, text mixed with numbers) is left as is.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values
+    try:
+        if pd.api.types.is_numeric_dtype(values):
+            converted = pd.to_datetime(values, unit='D', origin='1899-12-30', errors='coerce')
+        elif pd.api.types.infer_dtype(values, skipna=True) in ('string', 'date', 'datetime', 'empty'):
+            converted = pd.to_datetime(values, errors='coerce')
+        else:
+            return values
+    except (TypeError, ValueError, OverflowError):
+        return values
+    return values if (converted.isna() & values.notna()).any() else converted
+
+
+def apply_dtype_plan(df, plan=None):
+    """
+    Convert the columns of df named in the plan (DTYPE_PLAN by default) to their compact dtype.
+    Conversions are lossless: a column that does not fit (e.g. item indices with gaps, or levels
+    beyond int8) keeps its dtype. Returns a new DataFrame; df is left untouched.
+    Does nothing when COMPACT_DTYPES is off in config.py.
+    """
+    if not COMPACT_DTYPES:
+        return df
+    plan = DTYPE_PLAN if plan is None else plan
+    df = df.copy(deep=False)
+    for column in df.columns.intersection(list(plan)):
+        kind = plan[column]
+        values = df[column]
+        if kind in PLAN_INT_TYPES:
+            df[column] = _downcast_int(values, PLAN_INT_TYPES[kind])
+        elif kind == 'category':
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                df[column] = values.astype('category')
+        elif kind == 'datetime':
+            df[column] = _to_datetime(values)
+    return df
@@ -0,0 +1,176 @@
+# instrumentation.py
+import cProfile
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from config import RUN_REPORT_FILE, PROFILE_STAGE
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# The run being recorded (see start_run); stages started outside a run are timed but not recorded
+_active_run = None
+
+
+def _cpu_seconds():
+    """CPU time of this process plus its finished child processes (e.g. the BOM explosion workers)."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def frame_memory_mb(*frames):
+    """Memory held by the DataFrames (including the contents of text columns), in MB."""
+    return sum(df.memory_usage(index=True, deep=True).sum() for df in frames) / 1024 ** 2
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where the platform does not report it)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def profile_path(stage_name):
+    return f"Profile - {stage_name}.prof"
+
+
+class Stage:
+    """
+    One timed stage of a run, started with start_stage() and ended with finish() (or used as a context manager):
+      - Wall time and CPU time, rows in and rows out.
+      - Peak RSS of the process at the end of the stage, and how much the stage raised it.
+      - Memory held by the stage's output DataFrames, when they are passed to finish().
+    If it is the run's profiled stage, a cProfile dump of the stage is written when it finishes.
+    A stage that fails is finished with failed=True (on leaving its 'with' block through an exception,
+    or by finish_run() if it is still open), so it is reported and its profiler is always stopped.
+    """
+
+    def __init__(self, name, rows_in=None, run=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.frames = ()
+        self.run = run
+        self.record = None
+        self.profiler = cProfile.Profile() if run is not None and run.profile_stage == name else None
+        self.peak_before = peak_rss_mb()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = _cpu_seconds()
+        if run is not None:
+            run.open_stages.append(self)
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def finish(self, rows_out=None, frames=None, failed=False):
+        """End the stage and add its record to the run. Returns the record."""
+        if self.record is not None:
+            return self.record
+        wall_seconds = time.perf_counter() - self.wall_start
+        cpu_seconds = _cpu_seconds() - self.cpu_start
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(profile_path(self.name))
+            print(f"Profile of stage '{self.name}' saved to '{profile_path(self.name)}'.")
+
+        rows_out = self.rows_out if rows_out is None else rows_out
+        frames = self.frames if frames is None else frames
+        peak = peak_rss_mb()
+        self.record = {
+            'stage': self.name,
+            'wall_seconds': round(wall_seconds, 4),
+            'cpu_seconds': round(cpu_seconds, 4),
+            'rows_in': self.rows_in,
+            'rows_out': rows_out,
+            'frames_mb': round(frame_memory_mb(*frames), 2) if frames else None,
+            'peak_rss_mb': None if peak is None else round(peak, 1),
+            'peak_rss_growth_mb': None if peak is None else round(peak - self.peak_before, 1),
+            'failed': failed,
+        }
+        if self.run is not None:
+            self.run.stages.append(self.record)
+            self.run.open_stages.remove(self)
+        return self.record
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finish(failed=exc_type is not None)
+        return False
+
+
+class RunReport:
+    """The stage records of one pipeline run, written as a structured JSON report by finish()."""
+
+    def __init__(self, name, profile_stage=None):
+        self.name = name
+        self.profile_stage = profile_stage
+        self.stages = []
+        self.open_stages = []  # Started but not finished yet
+        self.started = datetime.now()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = _cpu_seconds()
+
+    def summary(self):
+        peak = peak_rss_mb()
+        return {
+            'run': self.name,
+            'started': self.started.isoformat(timespec='seconds'),
+            'wall_seconds': round(time.perf_counter() - self.wall_start, 4),
+            'cpu_seconds': round(_cpu_seconds() - self.cpu_start, 4),
+            'peak_rss_mb': None if peak is None else round(peak, 1),
+            'profile_stage': self.profile_stage,
+            'stages': self.stages,
+        }
+
+    def finish(self, report_file=RUN_REPORT_FILE):
+        """
+        Print the stage table and write the report as JSON (skipped if report_file is None). Returns the report.
+        Stages still open (cut short by an error) are finished first, as failed.
+        """
+        for stage in list(self.open_stages):
+            stage.finish(failed=True)
+        report = self.summary()
+        print(f"{'stage':<22} {'wall':>9} {'cpu':>9} {'rows in':>10} {'rows out':>10} {'frames':>10} {'peak RSS':>10}")
+        for record in self.stages:
+            frames = "" if record['frames_mb'] is None else f"{record['frames_mb']:.1f} MB"
+            peak = "n/a" if record['peak_rss_mb'] is None else f"{record['peak_rss_mb']:.1f} MB"
+            name = f"{record['stage']} (failed)" if record['failed'] else record['stage']
+            print(f"{name:<22} {record['wall_seconds']:>8.2f}s {record['cpu_seconds']:>8.2f}s "
+                  f"{_count(record['rows_in']):>10} {_count(record['rows_out']):>10} {frames:>10} {peak:>10}")
+        print(f"{'total':<22} {report['wall_seconds']:>8.2f}s {report['cpu_seconds']:>8.2f}s")
+        if report_file is not None:
+            with open(report_file, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Run report saved to '{report_file}'.")
+        return report
+
+
+def _count(rows):
+    return "" if rows is None else str(rows)
+
+
+def start_run(name='main', profile_stage=PROFILE_STAGE):
+    """Start recording a run; the stages started from now on are added to its report."""
+    global _active_run
+    _active_run = RunReport(name, profile_stage)
+    return _active_run
+
+
+def finish_run(report_file=RUN_REPORT_FILE):
+    """End the active run and write its report. Returns the report (None if no run was active)."""
+    global _active_run
+    run, _active_run = _active_run, None
+    return None if run is None else run.finish(report_file)
+
+
+def start_stage(name, rows_in=None):
+    """Start timing a stage of the active run."""
+    return Stage(name, rows_in, _active_run)
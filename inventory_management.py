@@ -2,6 +2,12 @@
 import pandas as pd
 import numpy as np
 
+from config import OUTPUT_NET_REQ, OUTPUT_UPDATED_INV, PLANNING_BUCKET, PARENT_RATIO_LOOKUP
+from data_loader import load_workbook_data
+from dtype_plan import apply_dtype_plan
+from instrumentation import start_stage
+from output_sinks import write_table
+
 
 def prepare_inventory(inventory_df):
     """
@@ -17,141 +23,334 @@ def prepare_inventory(inventory_df):
     return inventory_df
 
 
-def adjust_production_qty(row, inventory_df):
+class InventoryLedger:
+    """
+    Inventory positions held in NumPy arrays instead of label lookups on the inventory DataFrame:
+      - Every item index gets a dense integer slot; all items that can be touched are registered up front.
+      - 'stocked' marks the slots that are in inventory. Items first seen in a purchase become stocked
+        when it is received, in receipt order.
+      - to_frame() converts the ledger back to the inventory layout, for export only.
     """
-    For each sales order row, reduce the required quantity by the available inventory
-    and update inventory usage accordingly.
-    Returns a Series with 'Production QTY' and 'Inventory Used'.
+
+    def __init__(self, inventory_df, item_indices=()):
+        # 'inventory_df' as returned by prepare_inventory (indexed by 'Index')
+        self.frame = inventory_df
+        self.n_inventory = len(inventory_df)
+        registered = [pd.Series(indices) for indices in item_indices]
+        others = pd.Index(pd.concat(registered).dropna().unique()) if registered else pd.Index([])
+        self.items = inventory_df.index.append(others.difference(inventory_df.index, sort=False))
+
+        self.inventory = np.zeros(len(self.items))
+        self.used = np.zeros(len(self.items))
+        self.available = np.zeros(len(self.items))
+        self.inventory[:self.n_inventory] = inventory_df['Inventory'].to_numpy(dtype=float)
+        self.used[:self.n_inventory] = inventory_df['Used'].to_numpy(dtype=float)
+        self.available[:self.n_inventory] = inventory_df['Available'].to_numpy(dtype=float)
+        self.stocked = np.zeros(len(self.items), dtype=bool)
+        self.stocked[:self.n_inventory] = True
+        self.received = []  # Slots first stocked by a purchase, in receipt order
+
+    def slots(self, item_indices):
+        """Slot of each item index (-1 for unregistered or missing items)."""
+        return self.items.get_indexer(item_indices)
+
+    def stocked_slots(self, item_indices):
+        """Slot of each item index, or -1 where the item is not in inventory."""
+        slots = self.slots(item_indices)
+        return np.where((slots >= 0) & self.stocked[slots], slots, -1)
+
+    def receive(self, slot, qty):
+        """Add a received quantity to a slot, stocking the item if it was not in inventory."""
+        if not self.stocked[slot]:
+            self.stocked[slot] = True
+            self.received.append(slot)
+        self.available[slot] += qty
+        self.inventory[slot] += qty
+
+    def to_frame(self):
+        """The ledger in the layout of the prepared inventory DataFrame (received items appended)."""
+        inventory_df = self.frame.copy()
+        inventory_df['Inventory'] = self.inventory[:self.n_inventory]
+        inventory_df['Used'] = self.used[:self.n_inventory]
+        inventory_df['Available'] = self.available[:self.n_inventory]
+        if self.received:
+            received = pd.DataFrame({
+                'Inventory': self.inventory[self.received],
+                'Used': self.used[self.received],
+                'Available': self.available[self.received],
+                'Initial Inventory': 0
+            }, index=self.items[self.received])
+            inventory_df = pd.concat([inventory_df, received])
+            inventory_df.index.name = self.frame.index.name
+        return inventory_df
+
+
+def allocate_inventory(slots, demand, available, used):
     """
-    item_index = row['Index']
-    qty_needed = row['Open Sales QTY']
-    if item_index in inventory_df.index:
-        available_inventory = inventory_df.at[item_index, 'Available']
-        adjusted_qty = max(qty_needed - available_inventory, 0)
-        used_inventory = min(qty_needed, available_inventory)
-        inventory_df.at[item_index, 'Used'] += used_inventory
-        inventory_df.at[item_index, 'Available'] -= used_inventory
-        inventory_used = used_inventory
-    else:
-        adjusted_qty = qty_needed
-        inventory_used = 0
-    return pd.Series({'Production QTY': adjusted_qty, 'Inventory Used': inventory_used})
-
-
-def prepare_sales_orders(sales_orders_df, inventory_df):
+    First-come allocation of inventory to rows in row order, for all rows at once:
+      - Rows are grouped by inventory slot (-1 for items without inventory), keeping row order.
+      - Each row takes what is left of its slot's stock after the demand of the earlier rows of that slot,
+        as a row-by-row min(demand, available) would.
+    Demand is expected to be non-negative (open quantities). Updates 'available' and 'used' in place
+    and returns the inventory taken by each row.
+    """
+    taken = np.zeros(len(slots))
+    stocked = np.flatnonzero(slots >= 0)
+    if len(stocked) == 0:
+        return taken
+
+    rows = stocked[np.argsort(slots[stocked], kind='stable')]
+    row_slots = slots[rows]
+    row_demand = demand[rows].astype(float)
+    demand_through = np.cumsum(row_demand)
+    starts = np.flatnonzero(np.r_[True, row_slots[1:] != row_slots[:-1]])
+    run_lengths = np.diff(np.r_[starts, len(rows)])
+    demand_before = demand_through - row_demand - np.repeat((demand_through - row_demand)[starts], run_lengths)
+
+    take = np.clip(available[row_slots] - demand_before, 0, row_demand)
+    # Negative stock is taken in full by the first row of its slot, which leaves the slot empty
+    negative = available[row_slots[starts]] < 0
+    take[starts[negative]] = available[row_slots[starts[negative]]]
+    taken[rows] = take
+    slot_taken = np.add.reduceat(take, starts)
+    available[row_slots[starts]] -= slot_taken
+    used[row_slots[starts]] += slot_taken
+    return taken
+
+
+def prepare_sales_orders(sales_orders_df, ledger):
     """
     Prepare the sales orders DataFrame:
       - Rename the quantity column to 'Open Sales QTY'.
       - Sort orders by date.
-      - Adjust production quantities based on available inventory.
+      - Adjust production quantities based on available inventory (earlier orders take inventory first).
     """
     sales_orders_df = sales_orders_df.rename(columns={'QTY': 'Open Sales QTY'})
     sales_orders_df = sales_orders_df.sort_values(by='Date')
-    sales_orders_df[['Production QTY', 'Inventory Used']] = sales_orders_df.apply(
-        lambda row: adjust_production_qty(row, inventory_df), axis=1)
+    demand = sales_orders_df['Open Sales QTY'].to_numpy(dtype=float)
+    taken = allocate_inventory(ledger.stocked_slots(sales_orders_df['Index']), demand,
+                               ledger.available, ledger.used)
+    sales_orders_df['Production QTY'] = demand - taken
+    sales_orders_df['Inventory Used'] = taken
     return sales_orders_df
 
 
-def process_order(df_order, inventory_df, max_level):
+def consume_inventory(slots, demand, available, used):
     """
-    Process a group of sales orders (non-purchase transactions) by:
-      - Consuming inventory.
-      - Computing net requirements.
-      - Updating inventory.
+    Take each row's demand out of the available stock of its inventory slot (-1 for items without
+    inventory), as a row-by-row min(demand, available) in row order would:
+      - Rows whose slot appears once are settled all at once.
+      - Rows sharing a slot are settled in row order, so earlier rows take inventory first.
+    Updates 'available' and 'used' in place and returns the inventory used by each row and the
+    stock left after it (NaN for rows without inventory).
     """
+    taken = np.zeros(len(slots))
+    remaining = np.full(len(slots), np.nan)
+    stocked = np.flatnonzero(slots >= 0)
+    if len(stocked) == 0:
+        return taken, remaining
+
+    stocked_slots = slots[stocked]
+    _, inverse, counts = np.unique(stocked_slots, return_inverse=True, return_counts=True)
+    single = counts[inverse] == 1
+
+    rows, row_slots = stocked[single], stocked_slots[single]
+    take = np.minimum(demand[rows], available[row_slots])
+    available[row_slots] -= take
+    used[row_slots] += take
+    taken[rows] = take
+    remaining[rows] = available[row_slots]
+
+    for row in stocked[~single]:
+        slot = slots[row]
+        take = min(demand[row], available[slot])
+        available[slot] -= take
+        used[slot] += take
+        taken[row] = take
+        remaining[row] = available[slot]
+    return taken, remaining
+
+
+def net_order_levels(levels, parent_pos, initial_net, slots, available, used, max_level):
+    """
+    Net one order's exploded rows level by level. The ratio of each row's parent is a gather on
+    'parent_pos' (-1 for rows without a parent, see parent_positions), and each level consumes
+    inventory in bulk, in row order.
+    Returns the 'Ratio Prior Level', 'Net Requirements', 'Inventory Used', 'Stock Ratio' and
+    'Updated Inventory' arrays.
+    """
+    ratio_prior = np.ones(len(levels))
+    net = np.array(initial_net, dtype=float)
+    inventory_used = np.zeros(len(levels))
+    stock_ratio = np.ones(len(levels))
+    updated = np.full(len(levels), np.nan)
+
     for level in range(0, max_level + 1):
-        current_level_df = df_order[df_order['Level'] == level]
-        if current_level_df.empty:
+        level_rows = np.flatnonzero(levels == level)
+        if len(level_rows) == 0:
             continue
-        for idx, row in current_level_df.iterrows():
-            child_index = row['Child Index']
-            # Retrieve the initial net requirement from the row.
-            # (This column should have been created earlier.)
-            initial_net_requirement = row['Initial Net Requirements']
-            parent_index = row['Parent Index']
-
+        for rows in ([level_rows] if level == 0 else _level_runs(level_rows, parent_pos)):
             # Determine the ratio from the parent row (or 1.0 at top-level)
-            if level == 0:
-                ratio_prior_level = 1.0
-            else:
-                parent_rows = df_order[
-                    (df_order['Production Index'] == row['Production Index']) &
-                    (df_order['Child Index'] == parent_index)
-                    ]
-                ratio_prior_level = parent_rows['Stock Ratio'].values[0] if not parent_rows.empty else 1.0
-
-            df_order.at[idx, 'Ratio Prior Level'] = ratio_prior_level
-            net_requirement = initial_net_requirement * ratio_prior_level
-
-            if pd.notnull(child_index) and child_index in inventory_df.index:
-                available_inventory = inventory_df.at[child_index, 'Available']
-                used_inventory = min(net_requirement, available_inventory)
-                inventory_df.at[child_index, 'Used'] += used_inventory
-                inventory_df.at[child_index, 'Available'] -= used_inventory
-                net_requirement = max(net_requirement - used_inventory, 0)
-                df_order.at[idx, 'Net Requirements'] = net_requirement
-                df_order.at[idx, 'Inventory Used'] = used_inventory
-                stock_ratio = net_requirement / initial_net_requirement if initial_net_requirement != 0 else 0
-                df_order.at[idx, 'Stock Ratio'] = stock_ratio
-                df_order.at[idx, 'Updated Inventory'] = inventory_df.at[child_index, 'Available']
-            else:
-                df_order.at[idx, 'Inventory Used'] = 0.0
-                stock_ratio = net_requirement / initial_net_requirement if initial_net_requirement != 0 else 0
-                df_order.at[idx, 'Stock Ratio'] = stock_ratio
-                df_order.at[idx, 'Net Requirements'] = net_requirement
-                df_order.at[idx, 'Updated Inventory'] = np.nan
-    return df_order, inventory_df
-
-
-def process_purchase(df_order, inventory_df):
+            if level > 0:
+                parents = parent_pos[rows]
+                has_parent = parents >= 0
+                ratio_prior[rows] = np.where(has_parent, stock_ratio[np.where(has_parent, parents, 0)], 1.0)
+            requirement = initial_net[rows] * ratio_prior[rows]
+
+            taken, remaining = consume_inventory(slots[rows], requirement, available, used)
+            stocked = slots[rows] >= 0
+            net[rows] = np.where(stocked, np.maximum(requirement - taken, 0), requirement)
+            inventory_used[rows] = taken
+            updated[rows] = remaining
+            stock_ratio[rows] = np.divide(net[rows], initial_net[rows], out=np.zeros(len(rows)),
+                                          where=initial_net[rows] != 0)
+    return ratio_prior, net, inventory_used, stock_ratio, updated
+
+
+def _level_runs(rows, parent_pos):
+    """
+    Split one level's rows (in row order) into consecutive runs in which no row's parent is an earlier
+    row of the same run, so every run can gather its parents' Stock Ratio before it is netted.
+    A first-match parent can sit on the same level, earlier in the order; usually there is a single run.
+    """
+    parents = parent_pos[rows]
+    same_level = np.flatnonzero(np.isin(parents, rows) & (parents < rows))
+    if len(same_level) == 0:
+        return [rows]
+    starts = [0]
+    for i in same_level.tolist():
+        if parents[i] >= rows[starts[-1]]:
+            starts.append(i)
+    return np.split(rows, starts[1:])
+
+
+def process_order(levels, parent_pos, initial_net, child_index, ledger, max_level):
+    """
+    Process one group of sales orders (non-purchase transactions), given as arrays, by:
+      - Consuming inventory, level by level.
+      - Computing net requirements.
+      - Updating the inventory ledger.
+    'parent_pos' holds the position of each row's parent within the group (-1 for none).
+    Returns the 'Ratio Prior Level', 'Net Requirements', 'Inventory Used', 'Stock Ratio' and
+    'Updated Inventory' arrays.
+    """
+    slots = ledger.stocked_slots(child_index)
+    return net_order_levels(levels, parent_pos, initial_net, slots, ledger.available, ledger.used, max_level)
+
+
+def process_purchase(child_index, qty_purchased, ledger):
     """
     Process a purchase transaction group by:
       - Increasing on-hand inventory.
-      - Recording the updated inventory.
+      - Returning the updated inventory of each row.
     """
-    for idx, row in df_order.iterrows():
-        child_index = row['Child Index']
-        qty_purchased = row['Production QTY']
-        if pd.notnull(child_index):
-            if child_index in inventory_df.index:
-                inventory_df.at[child_index, 'Available'] += qty_purchased
-                inventory_df.at[child_index, 'Inventory'] += qty_purchased
-            else:
-                inventory_df.loc[child_index] = {
-                    'Inventory': qty_purchased,
-                    'Used': 0.0,
-                    'Available': qty_purchased,
-                    'Initial Inventory': 0
-                }
-            df_order.at[idx, 'Updated Inventory'] = inventory_df.at[child_index, 'Available']
-        else:
-            df_order.at[idx, 'Updated Inventory'] = np.nan
-        df_order.at[idx, 'Net Requirements'] = 0
-        df_order.at[idx, 'Inventory Used'] = -qty_purchased
-    return df_order, inventory_df
+    updated = np.full(len(child_index), np.nan)
+    for row, (slot, qty) in enumerate(zip(ledger.slots(child_index), qty_purchased)):
+        if slot >= 0:
+            ledger.receive(slot, qty)
+            updated[row] = ledger.available[slot]
+    return updated
 
 
-def process_transactions(fully_blow_out_df, mrp_data_file):
+def parent_positions(merged_df, lookup=PARENT_RATIO_LOOKUP):
+    """
+    Position of the row each row takes its 'Ratio Prior Level' from (-1 for none), in the merged
+    transaction stream (sorted so every 'Order Processed' group is one contiguous slice):
+      - "first match": the first row of the group whose Child Index is the row's Parent Index. When a
+        subassembly appears more than once in a production tree, every occurrence of its components
+        follows the first occurrence (and one not netted yet still has a Stock Ratio of 1.0).
+      - "parent row": the row's own parent row, recorded by the explosion. Duplicate sales lines in
+        one group each carry a copy of the BOM, so rows are matched within the same copy.
+    """
+    if lookup == 'parent row':
+        copy_no = merged_df.groupby(['Order Processed', 'Order']).cumcount()
+        row_keys = pd.MultiIndex.from_arrays([merged_df['Order Processed'], copy_no, merged_df['Order']])
+        parent_keys = pd.MultiIndex.from_arrays([merged_df['Order Processed'], copy_no, merged_df['Parent Order']])
+        return row_keys.get_indexer(parent_keys)
+    if lookup != 'first match':
+        raise ValueError(f"Unknown parent ratio lookup '{lookup}' (expected 'first match' or 'parent row')")
+    child_keys = pd.MultiIndex.from_arrays([merged_df['Order Processed'], merged_df['Child Index']])
+    first_rows = pd.Series(np.arange(len(merged_df)), index=child_keys)
+    first_rows = first_rows[~child_keys.duplicated()]
+    parent_keys = pd.MultiIndex.from_arrays([merged_df['Order Processed'], merged_df['Parent Index']])
+    matches = first_rows.index.get_indexer(parent_keys)
+    unmatched = (matches < 0) | merged_df['Parent Index'].isna().to_numpy()
+    return np.where(unmatched, -1, first_rows.to_numpy()[matches])
+
+
+# Period frequency of each planning bucket (weeks run Monday to Sunday)
+BUCKET_FREQUENCIES = {
+    'day': 'D',
+    'week': 'W',
+    'month': 'M',
+}
+
+
+def _bucket_lines(df, date_column, bucket):
+    """
+    Sum the 'QTY' of the lines per item ('Index') and bucket of date_column:
+      - The date becomes the bucket's first day and 'Document No_' the bucket's label (e.g. '2025-01').
+      - Lines without a date are kept, as one undated bucket per item.
+    """
+    periods = pd.to_datetime(df[date_column]).dt.to_period(BUCKET_FREQUENCIES[bucket])
+    grouped = (df.assign(Period=periods)
+               .groupby(['Period', 'Index'], dropna=False, sort=True, observed=True)['QTY'].sum()
+               .reset_index())
+    return pd.DataFrame({
+        'Index': grouped['Index'],
+        'QTY': grouped['QTY'],
+        date_column: grouped['Period'].dt.start_time,
+        'Document No_': grouped['Period'].astype(str).where(grouped['Period'].notna()),
+    })
+
+
+def bucket_transactions(sales_orders_df, purchases_df, bucket):
+    """
+    Aggregate sales demand and purchase receipts into planning buckets ('day', 'week' or 'month') per item,
+    so each bucket nets as one document per item. All demand of a bucket is netted before its receipts
+    (see process_transactions), so receipts only cover later buckets.
+    """
+    if bucket not in BUCKET_FREQUENCIES:
+        raise ValueError(f"Unknown planning bucket '{bucket}' (expected None or one of {list(BUCKET_FREQUENCIES)})")
+    sales_orders_df = apply_dtype_plan(_bucket_lines(sales_orders_df, 'Date', bucket))
+    purchases_df = apply_dtype_plan(_bucket_lines(purchases_df, 'Expected Receipt Date', bucket))
+    return sales_orders_df, purchases_df
+
+
+def process_transactions(fully_blow_out_df, mrp_data, bucket=PLANNING_BUCKET, export=True):
     """
     Process transactions by:
-      - Loading Sales Orders, Inventory, Item Table, and Purchases from the MRP data file.
+      - Taking Sales Orders, Inventory, Item Table, and Purchases from the loaded MRP workbook
+        (an MrpData bundle from data_loader.load_workbook_data, or a workbook path).
+      - With a planning bucket ('day', 'week' or 'month'), aggregating sales orders and purchases per item
+        and bucket (see bucket_transactions); with None, every document is netted separately.
       - Merging Sales Orders with the fully exploded BOM.
       - Converting Purchases to a BOM-like structure.
-      - Processing orders (consuming inventory) and purchases.
+      - Processing orders (consuming inventory) and purchases. Per document, the groups of a date go in
+        document-number order, as they always have; in planning buckets, all demand of a bucket is netted
+        before any receipt.
       - Mapping item indices to item numbers.
-      - Exporting the final net requirements and updated inventory.
+      - Exporting the final net requirements and updated inventory (see save_results), unless export is False.
 
     Returns the final processed DataFrame and the updated inventory DataFrame.
     """
-    # Load additional data from the MRP data file
-    items_to_produce_df = pd.read_excel(mrp_data_file, sheet_name='Sales Orders')
-    inventory_df = pd.read_excel(mrp_data_file, sheet_name='Inventory')
-    item_table_df = pd.read_excel(mrp_data_file, sheet_name='Item Table')
-    purchases_df = pd.read_excel(mrp_data_file, sheet_name='Purchases')
-
-    # Prepare inventory and sales orders
+    # Take the sheets from the loaded workbook (copies, as the bundle is shared between stages)
+    if isinstance(mrp_data, str):
+        mrp_data = load_workbook_data(mrp_data)
+    netting = start_stage('netting',
+                          rows_in=len(fully_blow_out_df) + len(mrp_data.sales_orders) + len(mrp_data.purchases))
+    items_to_produce_df = mrp_data.sales_orders.copy()
+    inventory_df = mrp_data.inventory.copy()
+    item_lookup = mrp_data.item_lookup()
+    purchases_df = mrp_data.purchases.copy()
+    if bucket is not None:
+        items_to_produce_df, purchases_df = bucket_transactions(items_to_produce_df, purchases_df, bucket)
+
+    # Prepare inventory and sales orders. Every item a transaction can touch gets a ledger slot up front.
     inventory_df = prepare_inventory(inventory_df)
-    items_to_produce_df = prepare_sales_orders(items_to_produce_df, inventory_df)
+    ledger = InventoryLedger(inventory_df, [
+        fully_blow_out_df['Child Index'], items_to_produce_df['Index'], purchases_df['Index']])
+    items_to_produce_df = prepare_sales_orders(items_to_produce_df, ledger)
 
     # --- Handle Sales Items with No BOM ---
     bom_parents = fully_blow_out_df['Production Index'].unique()
@@ -165,18 +364,25 @@ def process_transactions(fully_blow_out_df, mrp_data_file):
             'Parent Index': items_without_bom,
             'Child Index': items_without_bom,
             'QTY Per': 1,
-            'Total Quantity': 1
+            'Total Quantity': 1,
+            'Parent Row': -1
         })
         fully_blow_out_df = pd.concat([fully_blow_out_df, no_bom_df], ignore_index=True)
 
+    # The Order of each row's parent: every production item's rows are numbered contiguously
+    tree_start = fully_blow_out_df.groupby('Production Index')['Order'].transform('min')
+    fully_blow_out_df['Parent Order'] = np.where(
+        fully_blow_out_df['Parent Row'] >= 0, tree_start + fully_blow_out_df['Parent Row'], 0)
+
     # --- Convert Purchases into a BOM-like Structure ---
     purchases_df['Transaction Type'] = 'Purchase'
     purchases_df['Order'] = 1  # Arbitrary
     purchases_bom_df = pd.DataFrame({
         'Order': purchases_df['Order'],
+        'Parent Order': 0,
         'Production Index': purchases_df['Index'],
         'Level': 0,
-        'Parent Index': np.nan,
+        'Parent Index': purchases_df['Index'],  # Blanked on export; keeps the column integer
         'Child Index': purchases_df['Index'],
         'QTY Per': 1,
         'Total Quantity': 1,
@@ -207,7 +413,7 @@ def process_transactions(fully_blow_out_df, mrp_data_file):
     merged_sales_df = merged_sales_df.drop(columns=['Index'])
 
     # --- Combine Sales Orders and Purchases ---
-    merged_df = pd.concat([merged_sales_df, purchases_bom_df], ignore_index=True)
+    merged_df = apply_dtype_plan(pd.concat([merged_sales_df, purchases_bom_df], ignore_index=True))
     # Ensure 'Production QTY' and 'Total Quantity' exist and fill NaNs with 0 before calculation
     merged_df['Production QTY'] = merged_df['Production QTY'].fillna(0)
     merged_df['Total Quantity'] = merged_df['Total Quantity'].fillna(0)
@@ -226,27 +432,65 @@ def process_transactions(fully_blow_out_df, mrp_data_file):
     merged_df['Production Index'] = merged_df['Production Index'].fillna(merged_df['Child Index'])
 
     # Sort the DataFrame
-    merged_df.sort_values(by=['Date', 'Transaction Type', 'Production Index', 'Order'], inplace=True)
-    merged_df['Order Processed'] = merged_df.groupby(
-        ['Date', 'Document No_', 'Production Index', 'Transaction Type']
-    ).ngroup() + 1
-    max_level = merged_df['Level'].max()
-
-    # --- Process Each Transaction Group ---
-    processed_orders = []
-    for order_processed in sorted(merged_df['Order Processed'].unique()):
-        df_order = merged_df[merged_df['Order Processed'] == order_processed].copy()
-        if df_order.empty:
-            continue
-        transaction_type = df_order['Transaction Type'].iloc[0]
-        if transaction_type == 'Purchase':
-            df_order, inventory_df = process_purchase(df_order, inventory_df)
+    sort_keys = ['Date', 'Transaction Type', 'Production Index', 'Order']
+    group_keys = ['Date', 'Document No_', 'Production Index', 'Transaction Type']
+    if bucket is not None:
+        # A bucket's label is its document number, so rank receipts after all demand of the bucket explicitly
+        merged_df['Receipt'] = merged_df['Transaction Type'] == 'Purchase'
+        sort_keys.insert(1, 'Receipt')
+        group_keys.insert(1, 'Receipt')
+    merged_df.sort_values(by=sort_keys, inplace=True)
+    # Undated or unnumbered documents form groups of their own (numbered after the others),
+    # rather than a NaN key that would split them row by row
+    merged_df['Order Processed'] = merged_df.groupby(group_keys, dropna=False, observed=True).ngroup() + 1
+    max_level = int(merged_df['Level'].max())
+
+    # --- Partition the stream into its transaction groups once ---
+    # Groups are processed in 'Order Processed' order; the stable sort keeps each group's rows in
+    # the order above, so every group becomes one contiguous slice.
+    merged_df.sort_values(by='Order Processed', kind='stable', inplace=True)
+    merged_df.reset_index(drop=True, inplace=True)
+    group_keys = merged_df['Order Processed'].to_numpy()
+    boundaries = np.flatnonzero(group_keys[1:] != group_keys[:-1]) + 1
+    group_starts = np.concatenate(([0], boundaries))
+    group_ends = np.concatenate((boundaries, [len(merged_df)]))
+
+    parent_pos = parent_positions(merged_df, PARENT_RATIO_LOOKUP)
+
+    # --- Process Each Transaction Group into preallocated output columns ---
+    levels = merged_df['Level'].to_numpy()
+    child_index = merged_df['Child Index'].to_numpy()
+    initial_net = merged_df['Initial Net Requirements'].to_numpy(dtype=float)
+    production_qty = merged_df['Production QTY'].to_numpy(dtype=float)
+    is_purchase = (merged_df['Transaction Type'] == 'Purchase').to_numpy()
+    ratio_prior = merged_df['Ratio Prior Level'].to_numpy(dtype=float, copy=True)
+    net = merged_df['Net Requirements'].to_numpy(dtype=float, copy=True)
+    inventory_used = merged_df['Inventory Used'].to_numpy(dtype=float, copy=True)
+    stock_ratio = merged_df['Stock Ratio'].to_numpy(dtype=float, copy=True)
+    updated = np.full(len(merged_df), np.nan)
+
+    for start, end in zip(group_starts, group_ends):
+        group = slice(start, end)
+        if is_purchase[start]:
+            updated[group] = process_purchase(child_index[group], production_qty[group], ledger)
+            net[group] = 0
+            inventory_used[group] = -production_qty[group]
         else:
-            df_order, inventory_df = process_order(df_order, inventory_df, max_level)
-        processed_orders.append(df_order)
-
-    final_df = pd.concat(processed_orders, ignore_index=True)
-    final_df = final_df.drop(columns=['Order Processed'])
+            group_parent_pos = np.where(parent_pos[group] >= 0, parent_pos[group] - start, -1)
+            (ratio_prior[group], net[group], inventory_used[group], stock_ratio[group],
+             updated[group]) = process_order(levels[group], group_parent_pos, initial_net[group],
+                                             child_index[group], ledger, max_level)
+
+    merged_df['Ratio Prior Level'] = ratio_prior
+    merged_df['Net Requirements'] = net
+    merged_df['Inventory Used'] = inventory_used
+    merged_df['Stock Ratio'] = stock_ratio
+    merged_df['Updated Inventory'] = updated
+    netting.finish(rows_out=len(merged_df), frames=[merged_df])
+
+    mapping = start_stage('item mapping', rows_in=len(merged_df))
+    final_df = merged_df
+    final_df = final_df.drop(columns=['Order Processed', 'Parent Row', 'Parent Order', 'Receipt'], errors='ignore')
 
     # --- Final Cleanup and Renaming ---
     if 'Order' in final_df.columns:
@@ -255,10 +499,9 @@ def process_transactions(fully_blow_out_df, mrp_data_file):
     final_df['Order'] = range(1, len(final_df) + 1)
 
     # Map item indices to item numbers using the Item Table
-    item_index_to_no_dict = dict(zip(item_table_df['Item Index'], item_table_df['No_']))
     for col in ['Production Index', 'Child Index', 'Parent Index']:
         if col in final_df.columns:
-            final_df[col] = final_df[col].map(item_index_to_no_dict)
+            final_df[col] = item_lookup.numbers(final_df[col])
 
     final_df['Child Index'] = final_df['Child Index'].fillna('')
     final_df['Parent Index'] = final_df['Parent Index'].fillna('')
@@ -274,26 +517,25 @@ def process_transactions(fully_blow_out_df, mrp_data_file):
     })
     cols = final_df.columns.tolist()
     cols = ['Transaction Type', 'Order'] + [c for c in cols if c not in ['Transaction Type', 'Order']]
-    final_df = final_df[cols]
-
-    # --- Export Final Results ---
-    MAX_ROWS_PER_CHUNK = 500000
-    num_chunks = int(np.ceil(len(final_df) / MAX_ROWS_PER_CHUNK))
-    with pd.ExcelWriter('Final_Net_Requirements_Based_on_Inventory.xlsx', engine='openpyxl') as writer:
-        for i in range(num_chunks):
-            start_row = i * MAX_ROWS_PER_CHUNK
-            end_row = min((i + 1) * MAX_ROWS_PER_CHUNK, len(final_df))
-            chunk = final_df.iloc[start_row:end_row]
-            sheet_name = f'Data_Part_{i + 1}'
-            chunk.to_excel(writer, sheet_name=sheet_name, index=False)
-    print(f"Data saved into {num_chunks} sheet(s) in 'Final_Net_Requirements_Based_on_Inventory.xlsx'.")
-
-    # Export the updated inventory
-    inventory_df = inventory_df.reset_index()
-    inventory_df['Index'] = inventory_df['Index'].map(item_index_to_no_dict)
+    final_df = apply_dtype_plan(final_df[cols])
+
+    # Updated inventory, with item numbers
+    inventory_df = ledger.to_frame().reset_index()
+    inventory_df['Index'] = item_lookup.numbers(inventory_df['Index'])
     inventory_df = inventory_df.rename(columns={'Index': 'No_'})
-    inventory_df.to_excel('Updated_Inventory.xlsx', index=False)
-    print(
-        "Calculation and adjustment complete. Results saved to 'Final_Net_Requirements_Based_on_Inventory.xlsx' and 'Updated_Inventory.xlsx'.")
+    mapping.finish(rows_out=len(final_df), frames=[final_df])
 
+    if export:
+        save_results(final_df, inventory_df)
     return final_df, inventory_df
+
+
+def save_results(final_df, inventory_df):
+    """Export the net requirements and the updated inventory of process_transactions. Returns both paths."""
+    export = start_stage('export', rows_in=len(final_df))
+    net_requirements_file = write_table(final_df, OUTPUT_NET_REQ, sheet_name="Data_Part_{}")
+    inventory_file = write_table(inventory_df, OUTPUT_UPDATED_INV)
+    export.finish(rows_out=len(final_df) + len(inventory_df))
+    print(
+        f"Calculation and adjustment complete. Results saved to '{net_requirements_file}' and '{inventory_file}'.")
+    return net_requirements_file, inventory_file
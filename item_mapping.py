@@ -1,36 +1,63 @@
 # item_mapping.py
+import numpy as np
 import pandas as pd
 
-def merge_and_rename(bom_df, item_df, merge_column, new_column_prefix):
-    merged_df = bom_df.merge(
-        item_df[['Item Index', 'No_', 'Rev #']],
-        left_on=merge_column,
-        right_on='Item Index',
-        how='left'
-    )
-    merged_df.rename(
-        columns={
-            'No_': f'{new_column_prefix} No_',
-            'Rev #': f'{new_column_prefix} Rev #'
-        },
-        inplace=True
-    )
-    return merged_df
+from output_sinks import write_table
 
-def create_item_hierarchy(bom_hierarchy_df, item_table_df):
-    merged_main = merge_and_rename(bom_hierarchy_df, item_table_df, 'Production Index', 'Production')
-    merged_parent = merge_and_rename(bom_hierarchy_df, item_table_df, 'Parent Index', 'Parent')
-    merged_child = merge_and_rename(bom_hierarchy_df, item_table_df, 'Child Index', 'Child')
 
-    bom_itemhierarchy_df = bom_hierarchy_df.copy()
-    bom_itemhierarchy_df['Production No_'] = merged_main['Production No_']
-    bom_itemhierarchy_df['Production Rev #'] = merged_main['Production Rev #']
+class ItemLookup:
+    """
+    Item numbers and revisions by item index, built once from the Item Table:
+      - 'position' is a dense array indexed by Item Index, holding the row of each item (-1 for gaps);
+        'No_' and 'Rev #' are looked up with a vectorized take through it.
+      - An Item Index listed more than once resolves to its last row (as a dict built from the table would).
+      - Missing indices, and indices not in the Item Table, translate to NaN.
+    """
+
+    def __init__(self, item_table_df):
+        items = item_table_df.dropna(subset=['Item Index'])
+        items = items.drop_duplicates(subset='Item Index', keep='last').reset_index(drop=True)
+        indices = items['Item Index'].to_numpy(dtype=np.int64)
+        self.position = np.full(indices.max() + 1 if len(indices) else 0, -1, dtype=np.int64)
+        self.position[indices] = np.arange(len(items))
+        self.numbers_array = items['No_'].array
+        self.revisions_array = items['Rev #'].array
+
+    def positions(self, item_indices):
+        """Row in the Item Table of each item index (-1 where there is none)."""
+        values = np.asarray(item_indices, dtype=np.float64)
+        known = np.isfinite(values) & (values >= 0) & (values < len(self.position)) & (values == np.floor(values))
+        positions = np.full(len(values), -1, dtype=np.int64)
+        positions[known] = self.position[values[known].astype(np.int64)]
+        return positions
+
+    def numbers(self, item_indices):
+        """Item number ('No_') of each item index."""
+        return pd.api.extensions.take(self.numbers_array, self.positions(item_indices), allow_fill=True)
 
-    bom_itemhierarchy_df['Parent No_'] = merged_parent['Parent No_']
-    bom_itemhierarchy_df['Parent Rev #'] = merged_parent['Parent Rev #']
+    def revisions(self, item_indices):
+        """Revision ('Rev #') of each item index."""
+        return pd.api.extensions.take(self.revisions_array, self.positions(item_indices), allow_fill=True)
+
+
+def create_item_hierarchy(bom_hierarchy_df, item_table_df):
+    """
+    The BOM hierarchy with item numbers and revisions in place of the Production, Parent and Child indices.
+    'item_table_df' is the Item Table, or an ItemLookup already built from it.
+    """
+    lookup = item_table_df if isinstance(item_table_df, ItemLookup) else ItemLookup(item_table_df)
 
-    bom_itemhierarchy_df['Child No_'] = merged_child['Child No_']
-    bom_itemhierarchy_df['Child Rev #'] = merged_child['Child Rev #']
+    bom_itemhierarchy_df = pd.DataFrame(index=bom_hierarchy_df.index)
+    bom_itemhierarchy_df['Order'] = bom_hierarchy_df['Order']
+    for prefix in ['Production', 'Parent', 'Child']:
+        positions = lookup.positions(bom_hierarchy_df[f'{prefix} Index'])
+        bom_itemhierarchy_df[f'{prefix} No_'] = pd.api.extensions.take(
+            lookup.numbers_array, positions, allow_fill=True)
+        bom_itemhierarchy_df[f'{prefix} Rev #'] = pd.api.extensions.take(
+            lookup.revisions_array, positions, allow_fill=True)
+    bom_itemhierarchy_df['Level'] = bom_hierarchy_df['Level']
+    bom_itemhierarchy_df['QTY Per'] = bom_hierarchy_df['QTY Per']
+    bom_itemhierarchy_df['Total Quantity'] = bom_hierarchy_df['Total Quantity']
 
     desired_order = [
         'Order',
@@ -48,4 +75,4 @@ def create_item_hierarchy(bom_hierarchy_df, item_table_df):
     return bom_itemhierarchy_df
 
 def save_bom_item(bom_itemhierarchy_df, output_file):
-    bom_itemhierarchy_df.to_excel(output_file, index=False)
+    return write_table(bom_itemhierarchy_df, output_file)
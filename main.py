@@ -1,26 +1,68 @@
 # main.py
+import argparse
 
-from data_loader import load_bom_data, load_sales_orders, load_item_table
-from bom_explosion import create_bom_hierarchy
+from data_loader import load_workbook_data
+from bom_explosion import create_bom_hierarchy, create_bom_rollup, save_bom_rollup
+from bom_store import create_bom_hierarchy_from_store
 from inventory_management import process_transactions
-from config import EXCEL_FILE
+from mrp_engine import plan_by_low_level_code
+from instrumentation import start_run, finish_run, start_stage
+from config import EXCEL_FILE, USE_BOM_STORE, PROFILE_STAGE, PLANNING_BUCKET, NETTING_ENGINE, OUTPUT_BOM_ROLLUP
 
-def main():
-    # Load BOM data and sales orders using functions from data_loader
-    bom_data = load_bom_data()
-    sales_orders_df = load_sales_orders()
+def main(profile_stage=PROFILE_STAGE, bucket=PLANNING_BUCKET, engine=NETTING_ENGINE, rollup=False):
+    # Record every stage (timings, rows and memory) into the run report; it is written even if a stage fails
+    start_run('main', profile_stage)
+    try:
+        # Load every sheet of the MRP workbook in a single pass
+        mrp_data = load_workbook_data(EXCEL_FILE)
 
-    if bom_data is None or sales_orders_df is None:
-        print("Error loading BOM or Sales Orders. Exiting.")
-        return
+        if mrp_data is None:
+            print("Error loading the MRP workbook. Exiting.")
+            return
 
-    # Create the BOM hierarchy using top-level indices from the sales orders
-    top_level_indices = sales_orders_df['Index'].tolist()
-    bom_hierarchy_df, _ = create_bom_hierarchy(bom_data, top_level_indices)
+        # Only the total quantity of each component per production item, without netting
+        if rollup:
+            with start_stage('rollup', rows_in=len(mrp_data.bom)) as stage:
+                bom_rollup_df = create_bom_rollup(mrp_data.bom, mrp_data.top_level_indices())
+                item_lookup = mrp_data.item_lookup()
+                bom_rollup_df['Production Item'] = item_lookup.numbers(bom_rollup_df['Production Index'])
+                bom_rollup_df['Child Item'] = item_lookup.numbers(bom_rollup_df['Child Index'])
+                rollup_file = save_bom_rollup(bom_rollup_df, OUTPUT_BOM_ROLLUP)
+                stage.finish(rows_out=len(bom_rollup_df), frames=[bom_rollup_df])
+            print(f"BOM rollup complete. Results saved to '{rollup_file}'.")
+            return
 
-    # Process transactions (net requirements and inventory updates)
-    final_df, updated_inventory_df = process_transactions(bom_hierarchy_df, EXCEL_FILE)
-    print("Processing complete. Check output files for net requirements and updated inventory.")
+        # The low-level-code engine nets straight from the BOM graph, without exploding each sales order
+        if engine == 'llc':
+            plan_df, updated_inventory_df = plan_by_low_level_code(mrp_data, bucket)
+            print("Processing complete. Check output files for the MRP plan and updated inventory.")
+            return
+        bom_data = mrp_data.bom
+
+        # Create the BOM hierarchy using top-level indices from the sales orders
+        top_level_indices = mrp_data.top_level_indices()
+        if USE_BOM_STORE:
+            bom_hierarchy_df, _ = create_bom_hierarchy_from_store(bom_data, top_level_indices)
+        else:
+            bom_hierarchy_df, _ = create_bom_hierarchy(bom_data, top_level_indices)
+
+        # Process transactions (net requirements and inventory updates)
+        final_df, updated_inventory_df = process_transactions(bom_hierarchy_df, mrp_data, bucket)
+        print("Processing complete. Check output files for net requirements and updated inventory.")
+    finally:
+        finish_run()
 
 if __name__ == '__main__':
-    main()
+    # python main.py [--engine order|llc] [--bucket day|week|month] [--profile STAGE] [--rollup]
+    # (STAGE: load, explosion, netting, item mapping, export or rollup)
+    parser = argparse.ArgumentParser(description="Run MRP on the MRP workbook.")
+    parser.add_argument('--profile', default=PROFILE_STAGE, metavar='STAGE',
+                        help="write a cProfile dump of this stage")
+    parser.add_argument('--bucket', default=PLANNING_BUCKET, choices=['day', 'week', 'month'],
+                        help="net demand and receipts per item in planning buckets instead of per document")
+    parser.add_argument('--engine', default=NETTING_ENGINE, choices=['order', 'llc'],
+                        help="'order' nets each exploded sales order; 'llc' nets per item by low-level code")
+    parser.add_argument('--rollup', action='store_true',
+                        help="only write the gross quantity of each component per production item (OUTPUT_BOM_ROLLUP)")
+    args = parser.parse_args()
+    main(args.profile, args.bucket, args.engine, args.rollup)
@@ -0,0 +1,178 @@
+# mrp_engine.py
+import numpy as np
+import pandas as pd
+
+from bom_explosion import BomIndex, report_circular_references
+from config import OUTPUT_MRP_PLAN, OUTPUT_UPDATED_INV, PLANNING_BUCKET
+from data_loader import load_workbook_data
+from dtype_plan import apply_dtype_plan
+from instrumentation import start_stage
+from inventory_management import BUCKET_FREQUENCIES, prepare_inventory
+from output_sinks import write_table
+
+# Planning buckets of the low-level-code engine when no PLANNING_BUCKET is set (it always nets per bucket)
+DEFAULT_LLC_BUCKET = 'day'
+
+MRP_PLAN_COLUMNS = ['Low-Level Code', 'Item', 'Period', 'Date', 'Independent Demand', 'Dependent Demand',
+                    'Gross Requirements', 'Scheduled Receipts', 'Projected On Hand', 'Planned Orders']
+
+
+def _line_periods(dates, bucket):
+    return pd.to_datetime(dates).dt.to_period(BUCKET_FREQUENCIES[bucket])
+
+
+def planning_periods(sales_periods, receipt_periods, bucket):
+    """
+    The periods of the plan, in date order: every period with a sales or purchase line, plus one last
+    undated period (NaT) if some line has no date (undated documents are netted last, as in process_transactions).
+    """
+    periods = pd.concat([sales_periods, receipt_periods], ignore_index=True)
+    freq = BUCKET_FREQUENCIES[bucket]
+    dated = pd.PeriodIndex(periods.dropna().unique(), freq=freq).sort_values()
+    return dated.append(pd.PeriodIndex([pd.NaT], freq=freq)) if periods.isna().any() else dated
+
+
+def time_phase(item_codes, periods, qty, plan_periods, n_items):
+    """Sum the quantities of the lines into an (items x periods) array; lines without an item are dropped."""
+    columns = plan_periods.get_indexer(periods)
+    columns[periods.isna().to_numpy()] = len(plan_periods) - 1
+    phased = np.zeros((n_items, len(plan_periods)))
+    known = item_codes >= 0
+    np.add.at(phased, (item_codes[known], columns[known]), np.nan_to_num(qty[known]))
+    return phased
+
+
+def net_requirements(gross, receipts, on_hand):
+    """
+    Lot-for-lot netting of time-phased rows (one per item), for all rows at once:
+      - The receipts of a period arrive after all of its demand, as in process_transactions' planning buckets.
+      - Each period with demand plans what the stock and earlier receipts cannot cover. The planned orders
+        up to a period are the running maximum of that cumulative shortfall (negative stock adds to the
+        first demand).
+    Returns the planned orders and the projected on hand at the end of each period.
+    """
+    receipts_through = np.cumsum(receipts, axis=1)
+    gross_through = np.cumsum(gross, axis=1)
+    shortfall = np.where(gross > 0, gross_through - (receipts_through - receipts) - on_hand[:, None], 0)
+    planned_through = np.maximum.accumulate(np.maximum(shortfall, 0), axis=1)
+    planned = np.diff(planned_through, axis=1, prepend=0)
+    projected = on_hand[:, None] + receipts_through + planned_through - gross_through
+    return planned, projected
+
+
+def plan_by_low_level_code(mrp_data, bucket=PLANNING_BUCKET):
+    """
+    Gross-to-net MRP in the classic style, as an alternative to exploding and netting every sales order:
+      - Each item's low-level code is computed once from the BOM graph (lines closing a circular reference
+        are cut, see BomIndex.cycle_cuts).
+      - Sales orders and purchases are time-phased per item and planning bucket ('day' when no bucket is set).
+      - Items are netted level by level: all items of a low-level code have their total gross requirements
+        (sales plus the planned orders of their parents times 'QTY Per') netted once against inventory and
+        scheduled receipts, lot-for-lot and without lead times. Their planned orders then become the
+        dependent demand of their components.
+    The work grows with items x periods rather than with orders x exploded rows, but there is no pegging
+    of requirements to sales documents.
+    On a BOM without circular references, the planned orders per item and period equal the net requirements
+    of process_transactions with the same bucket only if PARENT_RATIO_LOOKUP is "parent row" and no sold item
+    is also a component or purchased. process_transactions nets every sales line against its item's starting
+    stock up front (prepare_sales_orders), before any component demand or receipt. Its "first match" ratios
+    follow the first occurrence of a repeated subassembly.
+    Exports the plan (non-empty item / period rows) and the updated inventory; returns both DataFrames.
+    """
+    if isinstance(mrp_data, str):
+        mrp_data = load_workbook_data(mrp_data)
+    bucket = DEFAULT_LLC_BUCKET if bucket is None else bucket
+    if bucket not in BUCKET_FREQUENCIES:
+        raise ValueError(f"Unknown planning bucket '{bucket}' (expected None or one of {list(BUCKET_FREQUENCIES)})")
+    sales_orders_df = mrp_data.sales_orders
+    purchases_df = mrp_data.purchases
+    inventory_df = prepare_inventory(mrp_data.inventory.copy())
+    netting = start_stage('netting', rows_in=len(mrp_data.bom) + len(sales_orders_df) + len(purchases_df))
+
+    # --- Low-level codes; items outside the BOM sheet follow its items, at level 0 ---
+    bom_index = BomIndex(mrp_data.bom)
+    report_circular_references(bom_index)
+    cut = bom_index.cycle_cuts()
+    bom_items = pd.Index(bom_index.items)
+    others = pd.Index(pd.concat([sales_orders_df['Index'], purchases_df['Index']]).dropna().unique())
+    items = bom_items.append(others.difference(bom_items, sort=False))
+    low_level_codes = np.zeros(len(items), dtype=np.int64)
+    low_level_codes[:bom_index.n_items] = bom_index.low_level_codes(cut)
+
+    # --- Time-phased independent demand, scheduled receipts and stock on hand ---
+    sales_periods = _line_periods(sales_orders_df['Date'], bucket)
+    receipt_periods = _line_periods(purchases_df['Expected Receipt Date'], bucket)
+    periods = planning_periods(sales_periods, receipt_periods, bucket)
+    independent = time_phase(items.get_indexer(sales_orders_df['Index']), sales_periods,
+                             sales_orders_df['QTY'].to_numpy(dtype=float), periods, len(items))
+    receipts = time_phase(items.get_indexer(purchases_df['Index']), receipt_periods,
+                          purchases_df['QTY'].to_numpy(dtype=float), periods, len(items))
+    stock_rows = inventory_df.index.get_indexer(items)
+    on_hand = np.where(stock_rows >= 0, inventory_df['Available'].to_numpy(dtype=float)[stock_rows], 0.0)
+
+    # --- Net level by level; planned orders pass down to the components through QTY Per ---
+    # (child x parent) matrix in column layout, so each level's parents are a cheap column slice
+    explode = bom_index.qty_per_matrix(cut).T.tocsc()
+    dependent = np.zeros_like(independent)
+    planned = np.zeros_like(independent)
+    projected = np.zeros_like(independent)
+    for level in range(int(low_level_codes.max(initial=0)) + 1):
+        rows = np.flatnonzero(low_level_codes == level)
+        planned[rows], projected[rows] = net_requirements(
+            independent[rows] + dependent[rows], receipts[rows], on_hand[rows])
+        parents = rows[rows < bom_index.n_items]
+        components = explode[:, parents].tocsr()
+        children = np.flatnonzero(np.diff(components.indptr))
+        if len(children):
+            dependent[children] += components[children] @ planned[parents]
+    gross = independent + dependent
+    netting.finish(rows_out=len(items) * len(periods))
+
+    # --- Plan rows: every item / period with demand, receipts or planned orders ---
+    mapping = start_stage('item mapping', rows_in=len(items) * len(periods))
+    item_rows, period_columns = np.nonzero((gross != 0) | (receipts != 0) | (planned != 0))
+    order = np.lexsort((period_columns, items[item_rows].to_numpy(), low_level_codes[item_rows]))
+    item_rows, period_columns = item_rows[order], period_columns[order]
+    plan_periods = periods[period_columns]
+    plan_df = apply_dtype_plan(pd.DataFrame({
+        'Low-Level Code': low_level_codes[item_rows],
+        'Item': mrp_data.item_lookup().numbers(items[item_rows]),
+        'Period': pd.Series(plan_periods.astype(str)).where(~plan_periods.isna(), ''),
+        'Date': plan_periods.start_time,
+        'Independent Demand': independent[item_rows, period_columns],
+        'Dependent Demand': dependent[item_rows, period_columns],
+        'Gross Requirements': gross[item_rows, period_columns],
+        'Scheduled Receipts': receipts[item_rows, period_columns],
+        'Projected On Hand': projected[item_rows, period_columns],
+        'Planned Orders': planned[item_rows, period_columns],
+    }, columns=MRP_PLAN_COLUMNS))
+    plan_df['Item'] = plan_df['Item'].fillna('')
+
+    # --- Updated inventory, in the layout of process_transactions (received items appended) ---
+    received = receipts.sum(axis=1)
+    purchase_order = purchases_df.sort_values(by='Expected Receipt Date', kind='stable')['Index']
+    received_items = pd.Index(purchase_order.dropna().unique()).difference(inventory_df.index, sort=False)
+    received_items = received_items[received[items.get_indexer(received_items)] != 0]
+    inventory_items = inventory_df.index.append(received_items)
+    positions = items.get_indexer(inventory_items)
+    updated_inventory_df = pd.concat([inventory_df, pd.DataFrame({'Initial Inventory': 0}, index=received_items)])
+    updated_inventory_df.index.name = inventory_df.index.name
+    tracked = positions >= 0
+    updated_inventory_df['Inventory'] = updated_inventory_df['Initial Inventory'].to_numpy(dtype=float)
+    updated_inventory_df.loc[tracked, 'Inventory'] += received[positions[tracked]]
+    updated_inventory_df['Available'] = updated_inventory_df['Inventory']
+    updated_inventory_df.loc[tracked, 'Available'] = projected[positions[tracked], -1] if len(periods) else 0.0
+    updated_inventory_df['Used'] = updated_inventory_df['Inventory'] - updated_inventory_df['Available']
+    updated_inventory_df = updated_inventory_df.reset_index()
+    updated_inventory_df['Index'] = mrp_data.item_lookup().numbers(updated_inventory_df['Index'])
+    updated_inventory_df = updated_inventory_df.rename(columns={'Index': 'No_'})
+    mapping.finish(rows_out=len(plan_df), frames=[plan_df])
+
+    # --- Export ---
+    export = start_stage('export', rows_in=len(plan_df))
+    plan_file = write_table(plan_df, OUTPUT_MRP_PLAN, sheet_name="Data_Part_{}")
+    inventory_file = write_table(updated_inventory_df, OUTPUT_UPDATED_INV)
+    export.finish(rows_out=len(plan_df) + len(updated_inventory_df))
+    print(f"Low-level-code MRP complete ({int(low_level_codes.max(initial=0)) + 1} levels, {len(periods)} periods). "
+          f"Results saved to '{plan_file}' and '{inventory_file}'.")
+    return plan_df, updated_inventory_df
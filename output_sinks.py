@@ -0,0 +1,107 @@
+# output_sinks.py
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from config import OUTPUT_FORMAT, MAX_ROWS_PER_CHUNK
+
+# File extension written by each output format
+OUTPUT_EXTENSIONS = {
+    'xlsx': '.xlsx',
+    'parquet': '.parquet',
+    'csv': '.csv',
+}
+
+
+def output_path(output_file, output_format=OUTPUT_FORMAT):
+    """The output file name with the extension of the output format."""
+    return os.path.splitext(output_file)[0] + OUTPUT_EXTENSIONS[output_format]
+
+
+def _cell_values(chunk):
+    """Columns of the chunk as lists of plain Python values, with missing values as None (empty cells)."""
+    return [chunk[column].astype(object).where(chunk[column].notna(), None).tolist() for column in chunk.columns]
+
+
+def iter_chunks(df):
+    """The DataFrame in chunks of MAX_ROWS_PER_CHUNK rows (one empty chunk for an empty DataFrame)."""
+    num_chunks = max(1, -(-len(df) // MAX_ROWS_PER_CHUNK))
+    for i in range(num_chunks):
+        yield df.iloc[i * MAX_ROWS_PER_CHUNK:(i + 1) * MAX_ROWS_PER_CHUNK]
+
+
+def write_xlsx(df, path, sheet_name):
+    """
+    Stream the DataFrame into a write-only workbook, MAX_ROWS_PER_CHUNK rows per sheet.
+    Sheets are named sheet_name.format(n) for n = 1, 2, ...
+    Returns the number of sheets written.
+    """
+    workbook = Workbook(write_only=True)
+    num_chunks = 0
+    for chunk in iter_chunks(df):
+        num_chunks += 1
+        sheet = workbook.create_sheet(sheet_name.format(num_chunks))
+        sheet.append([str(column) for column in chunk.columns])
+        for row in zip(*_cell_values(chunk)):
+            sheet.append(row)
+    workbook.save(path)
+    return num_chunks
+
+
+def _parquet_chunk(chunk):
+    # Parquet cannot hold columns mixing numbers and text, so object columns are stored as text
+    chunk = chunk.copy(deep=False)
+    for column in chunk.columns[chunk.dtypes == object]:
+        chunk[column] = chunk[column].where(chunk[column].isna(), chunk[column].astype(str))
+    return chunk
+
+
+def write_parquet(df, path):
+    """
+    Write the DataFrame to Parquet, one row group per MAX_ROWS_PER_CHUNK rows.
+    Object columns are stored as text, since Parquet cannot hold columns mixing numbers and text.
+    """
+    writer = None
+    try:
+        for chunk in iter_chunks(df):
+            table = pa.Table.from_pandas(_parquet_chunk(chunk), preserve_index=False)
+            if writer is None:
+                # Columns with no values in the first chunk are typed as text
+                schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                    for field in table.schema]).with_metadata(table.schema.metadata)
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_csv(df, path):
+    """Write the DataFrame to CSV, MAX_ROWS_PER_CHUNK rows at a time."""
+    for i, chunk in enumerate(iter_chunks(df)):
+        chunk.to_csv(path, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+
+
+def write_table(df, output_file, sheet_name="Sheet{}", output_format=OUTPUT_FORMAT):
+    """
+    Write a result table through the sink selected by OUTPUT_FORMAT in config.py:
+      - 'xlsx': streaming write-only workbook, split into sheets of MAX_ROWS_PER_CHUNK rows.
+      - 'parquet': one Parquet file (row groups of MAX_ROWS_PER_CHUNK rows).
+      - 'csv': one CSV file, written in chunks of MAX_ROWS_PER_CHUNK rows.
+    The extension of output_file is replaced by the one of the format. Returns the path written.
+    """
+    path = output_path(output_file, output_format)
+    if output_format == 'xlsx':
+        num_sheets = write_xlsx(df, path, sheet_name)
+        print(f"Data saved into {num_sheets} sheet(s) in '{path}'.")
+    elif output_format == 'parquet':
+        write_parquet(df, path)
+        print(f"Data saved to '{path}'.")
+    elif output_format == 'csv':
+        write_csv(df, path)
+        print(f"Data saved to '{path}'.")
+    else:
+        raise ValueError(f"Unknown output format '{output_format}' (expected one of {list(OUTPUT_EXTENSIONS)})")
+    return path
@@ -0,0 +1,307 @@
+# tests/baseline.py
+"""
+The original row-by-row pipeline, kept as the reference the vectorized code is tested against.
+The logic is unchanged; it takes an MrpData bundle instead of reading the workbook, and returns its
+results instead of exporting them.
+"""
+import numpy as np
+import pandas as pd
+
+
+def plain(df):
+    """The frame without the compact dtypes of dtype_plan (categoricals back to objects)."""
+    df = df.copy()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    return df
+
+
+# --- BOM explosion ---
+
+def build_indented_bom(bom, main_number, parent_index, level=0, parent_qty=1, bom_hierarchy=None, path=None,
+                       circular_references=None):
+    if bom_hierarchy is None:
+        bom_hierarchy = []
+    if path is None:
+        path = []
+    if circular_references is None:
+        circular_references = set()
+
+    path.append(parent_index)
+    components = bom[bom['Parent Index'] == parent_index]
+    for _, component in components.iterrows():
+        component_index = component['Child Index']
+        if component_index in path:
+            circular_references.add((parent_index, component_index))
+            continue
+        component_total_qty = component['QTY Per'] * parent_qty
+        bom_hierarchy.append({
+            'Production Index': main_number,
+            'Level': level,
+            'Parent Index': parent_index,
+            'Child Index': component_index,
+            'QTY Per': component['QTY Per'],
+            'Total Quantity': component_total_qty
+        })
+        if bom['Parent Index'].eq(component_index).any():
+            build_indented_bom(bom, main_number, component_index, level + 1, component_total_qty, bom_hierarchy,
+                               path, circular_references)
+    path.pop()
+    return bom_hierarchy, circular_references
+
+
+def create_bom_hierarchy(bom_data, top_level_indices):
+    bom_hierarchy_list = []
+    circular_references_set = set()
+    processed_indices = set()
+    for index in top_level_indices:
+        if index not in processed_indices:
+            hierarchy, circular_refs = build_indented_bom(bom_data, index, index)
+            bom_hierarchy_list.extend(hierarchy)
+            circular_references_set.update(circular_refs)
+            processed_indices.add(index)
+
+    bom_hierarchy_df = pd.DataFrame(bom_hierarchy_list)
+    bom_hierarchy_df.insert(0, 'Order', range(1, len(bom_hierarchy_df) + 1))
+    return bom_hierarchy_df, circular_references_set
+
+
+# --- Inventory ---
+
+def allocate_inventory(slots, demand, available, used):
+    """Row-by-row min(demand, available), in row order (adjust_production_qty of the original)."""
+    taken = np.zeros(len(slots))
+    for row, slot in enumerate(slots):
+        if slot >= 0:
+            take = min(demand[row], available[slot])
+            available[slot] -= take
+            used[slot] += take
+            taken[row] = take
+    return taken
+
+
+def consume_inventory(slots, demand, available, used):
+    """Row-by-row min(demand, available), in row order (the inventory step of the original process_order)."""
+    taken = np.zeros(len(slots))
+    remaining = np.full(len(slots), np.nan)
+    for row, slot in enumerate(slots):
+        if slot >= 0:
+            take = min(demand[row], available[slot])
+            available[slot] -= take
+            used[slot] += take
+            taken[row] = take
+            remaining[row] = available[slot]
+    return taken, remaining
+
+
+# --- Transaction netting ---
+
+def prepare_inventory(inventory_df):
+    inventory_df['Initial Inventory'] = inventory_df['Inventory'].copy()
+    inventory_df['Used'] = 0.0
+    inventory_df['Available'] = inventory_df['Inventory'].astype(float)
+    inventory_df.set_index('Index', inplace=True)
+    return inventory_df
+
+
+def adjust_production_qty(row, inventory_df):
+    item_index = row['Index']
+    qty_needed = row['Open Sales QTY']
+    if item_index in inventory_df.index:
+        available_inventory = inventory_df.at[item_index, 'Available']
+        adjusted_qty = max(qty_needed - available_inventory, 0)
+        used_inventory = min(qty_needed, available_inventory)
+        inventory_df.at[item_index, 'Used'] += used_inventory
+        inventory_df.at[item_index, 'Available'] -= used_inventory
+        inventory_used = used_inventory
+    else:
+        adjusted_qty = qty_needed
+        inventory_used = 0
+    return pd.Series({'Production QTY': adjusted_qty, 'Inventory Used': inventory_used})
+
+
+def prepare_sales_orders(sales_orders_df, inventory_df):
+    sales_orders_df = sales_orders_df.rename(columns={'QTY': 'Open Sales QTY'})
+    sales_orders_df = sales_orders_df.sort_values(by='Date')
+    sales_orders_df[['Production QTY', 'Inventory Used']] = sales_orders_df.apply(
+        lambda row: adjust_production_qty(row, inventory_df), axis=1)
+    return sales_orders_df
+
+
+def process_order(df_order, inventory_df, max_level):
+    for level in range(0, max_level + 1):
+        current_level_df = df_order[df_order['Level'] == level]
+        if current_level_df.empty:
+            continue
+        for idx, row in current_level_df.iterrows():
+            child_index = row['Child Index']
+            initial_net_requirement = row['Initial Net Requirements']
+            parent_index = row['Parent Index']
+            if level == 0:
+                ratio_prior_level = 1.0
+            else:
+                parent_rows = df_order[
+                    (df_order['Production Index'] == row['Production Index']) &
+                    (df_order['Child Index'] == parent_index)
+                    ]
+                ratio_prior_level = parent_rows['Stock Ratio'].values[0] if not parent_rows.empty else 1.0
+
+            df_order.at[idx, 'Ratio Prior Level'] = ratio_prior_level
+            net_requirement = initial_net_requirement * ratio_prior_level
+
+            if pd.notnull(child_index) and child_index in inventory_df.index:
+                available_inventory = inventory_df.at[child_index, 'Available']
+                used_inventory = min(net_requirement, available_inventory)
+                inventory_df.at[child_index, 'Used'] += used_inventory
+                inventory_df.at[child_index, 'Available'] -= used_inventory
+                net_requirement = max(net_requirement - used_inventory, 0)
+                df_order.at[idx, 'Net Requirements'] = net_requirement
+                df_order.at[idx, 'Inventory Used'] = used_inventory
+                stock_ratio = net_requirement / initial_net_requirement if initial_net_requirement != 0 else 0
+                df_order.at[idx, 'Stock Ratio'] = stock_ratio
+                df_order.at[idx, 'Updated Inventory'] = inventory_df.at[child_index, 'Available']
+            else:
+                df_order.at[idx, 'Inventory Used'] = 0.0
+                stock_ratio = net_requirement / initial_net_requirement if initial_net_requirement != 0 else 0
+                df_order.at[idx, 'Stock Ratio'] = stock_ratio
+                df_order.at[idx, 'Net Requirements'] = net_requirement
+                df_order.at[idx, 'Updated Inventory'] = np.nan
+    return df_order, inventory_df
+
+
+def process_purchase(df_order, inventory_df):
+    for idx, row in df_order.iterrows():
+        child_index = row['Child Index']
+        qty_purchased = row['Production QTY']
+        if pd.notnull(child_index):
+            if child_index in inventory_df.index:
+                inventory_df.at[child_index, 'Available'] += qty_purchased
+                inventory_df.at[child_index, 'Inventory'] += qty_purchased
+            else:
+                inventory_df.loc[child_index] = {
+                    'Inventory': qty_purchased,
+                    'Used': 0.0,
+                    'Available': qty_purchased,
+                    'Initial Inventory': 0
+                }
+            df_order.at[idx, 'Updated Inventory'] = inventory_df.at[child_index, 'Available']
+        else:
+            df_order.at[idx, 'Updated Inventory'] = np.nan
+        df_order.at[idx, 'Net Requirements'] = 0
+        df_order.at[idx, 'Inventory Used'] = -qty_purchased
+    return df_order, inventory_df
+
+
+def process_transactions(fully_blow_out_df, mrp_data):
+    items_to_produce_df = plain(mrp_data.sales_orders)
+    inventory_df = plain(mrp_data.inventory)
+    item_table_df = plain(mrp_data.item_table)
+    purchases_df = plain(mrp_data.purchases)
+
+    inventory_df = prepare_inventory(inventory_df)
+    items_to_produce_df = prepare_sales_orders(items_to_produce_df, inventory_df)
+
+    bom_parents = fully_blow_out_df['Production Index'].unique()
+    sales_items = items_to_produce_df['Index'].unique()
+    items_without_bom = np.setdiff1d(sales_items, bom_parents)
+    if len(items_without_bom) > 0:
+        no_bom_df = pd.DataFrame({
+            'Order': 1,
+            'Production Index': items_without_bom,
+            'Level': 0,
+            'Parent Index': items_without_bom,
+            'Child Index': items_without_bom,
+            'QTY Per': 1,
+            'Total Quantity': 1
+        })
+        fully_blow_out_df = pd.concat([fully_blow_out_df, no_bom_df], ignore_index=True)
+
+    purchases_df['Transaction Type'] = 'Purchase'
+    purchases_df['Order'] = 1
+    purchases_bom_df = pd.DataFrame({
+        'Order': purchases_df['Order'],
+        'Production Index': purchases_df['Index'],
+        'Level': 0,
+        'Parent Index': np.nan,
+        'Child Index': purchases_df['Index'],
+        'QTY Per': 1,
+        'Total Quantity': 1,
+        'Production QTY': purchases_df['QTY'],
+        'Inventory Used': 0,
+        'Date': purchases_df['Expected Receipt Date'],
+        'Document No_': purchases_df['Document No_'],
+        'Transaction Type': purchases_df['Transaction Type'],
+        'Open Sales QTY': 0
+    })
+
+    items_to_produce_df['Transaction Type'] = np.where(
+        items_to_produce_df['Index'].isin(items_without_bom), 'Non Production Items', 'Production Items')
+    merged_sales_df = pd.merge(
+        fully_blow_out_df,
+        items_to_produce_df[['Index', 'Open Sales QTY', 'Production QTY', 'Inventory Used', 'Date', 'Document No_',
+                             'Transaction Type']],
+        left_on='Production Index',
+        right_on='Index',
+        how='inner'
+    )
+    merged_sales_df = merged_sales_df.drop(columns=['Index'])
+
+    merged_df = pd.concat([merged_sales_df, purchases_bom_df], ignore_index=True)
+    merged_df['Production QTY'] = merged_df['Production QTY'].fillna(0)
+    merged_df['Total Quantity'] = merged_df['Total Quantity'].fillna(0)
+    merged_df['Initial Net Requirements'] = merged_df['Total Quantity'] * merged_df['Production QTY']
+    merged_df['Net Requirements'] = merged_df['Initial Net Requirements']
+    merged_df['Stock Ratio'] = 1.0
+    merged_df['Ratio Prior Level'] = 1.0
+    if 'Inventory Used' not in merged_df.columns:
+        merged_df['Inventory Used'] = 0.0
+    merged_df['Production Index'] = merged_df['Production Index'].fillna(merged_df['Child Index'])
+
+    merged_df.sort_values(by=['Date', 'Transaction Type', 'Production Index', 'Order'], inplace=True)
+    merged_df['Order Processed'] = merged_df.groupby(
+        ['Date', 'Document No_', 'Production Index', 'Transaction Type']
+    ).ngroup() + 1
+    max_level = merged_df['Level'].max()
+
+    processed_orders = []
+    for order_processed in sorted(merged_df['Order Processed'].unique()):
+        df_order = merged_df[merged_df['Order Processed'] == order_processed].copy()
+        if df_order.empty:
+            continue
+        transaction_type = df_order['Transaction Type'].iloc[0]
+        if transaction_type == 'Purchase':
+            df_order, inventory_df = process_purchase(df_order, inventory_df)
+        else:
+            df_order, inventory_df = process_order(df_order, inventory_df, max_level)
+        processed_orders.append(df_order)
+
+    final_df = pd.concat(processed_orders, ignore_index=True)
+    final_df = final_df.drop(columns=['Order Processed'])
+    if 'Order' in final_df.columns:
+        final_df = final_df.drop(columns=['Order'])
+    final_df = final_df.reset_index(drop=True)
+    final_df['Order'] = range(1, len(final_df) + 1)
+
+    item_index_to_no_dict = dict(zip(item_table_df['Item Index'], item_table_df['No_']))
+    for col in ['Production Index', 'Child Index', 'Parent Index']:
+        if col in final_df.columns:
+            final_df[col] = final_df[col].map(item_index_to_no_dict)
+    final_df['Child Index'] = final_df['Child Index'].fillna('')
+    final_df['Parent Index'] = final_df['Parent Index'].fillna('')
+    final_df['Production Index'] = final_df['Production Index'].fillna('')
+    final_df.loc[final_df['Transaction Type'] == 'Purchase', 'Production Index'] = ''
+    final_df.loc[final_df['Transaction Type'] == 'Purchase', 'Parent Index'] = ''
+    final_df = final_df.rename(columns={
+        'Production Index': 'Production Item',
+        'Child Index': 'Child Item',
+        'Parent Index': 'Parent Item'
+    })
+    cols = final_df.columns.tolist()
+    cols = ['Transaction Type', 'Order'] + [c for c in cols if c not in ['Transaction Type', 'Order']]
+    final_df = final_df[cols]
+
+    inventory_df = inventory_df.reset_index()
+    inventory_df['Index'] = inventory_df['Index'].map(item_index_to_no_dict)
+    inventory_df = inventory_df.rename(columns={'Index': 'No_'})
+    return final_df, inventory_df
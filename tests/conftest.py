@@ -0,0 +1,38 @@
+# tests/conftest.py
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+# The project modules live in the project folder, next to this one (the extractors in its 'Raw Data' folder)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(1, os.path.join(PROJECT_DIR, 'Raw Data'))
+
+from benchmarks.generator import generate_mrp_data  # noqa: E402
+
+# Small seeded data sets (overrides of generator.DEFAULT_PARAMS): one tree-like, one with shared
+# subassemblies and circular references
+DATA_SETS = {
+    'tree': {'n_items': 150, 'n_sales': 60, 'n_purchases': 30, 'shared_ratio': 0.0, 'cycle_rate': 0.0, 'seed': 11},
+    'shared': {'n_items': 200, 'n_sales': 80, 'n_purchases': 40, 'shared_ratio': 0.4, 'cycle_rate': 0.02, 'seed': 5},
+}
+
+
+@pytest.fixture(autouse=True)
+def run_in_tmp_path(tmp_path, monkeypatch):
+    """The pipeline writes its outputs (and stores) to the working folder, so every test runs in its own."""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(params=list(DATA_SETS))
+def mrp_data(request):
+    return generate_mrp_data(DATA_SETS[request.param])
+
+
+@pytest.fixture
+def quiet():
+    """Context manager silencing the pipeline's progress prints."""
+    return lambda: contextlib.redirect_stdout(io.StringIO())
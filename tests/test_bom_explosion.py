@@ -0,0 +1,104 @@
+# tests/test_bom_explosion.py
+import pandas.testing as pdt
+import pytest
+
+import baseline
+from bom_explosion import (BomExplosion, BomIndex, HierarchyRows, build_indented_bom, create_bom_hierarchy,
+                           create_bom_rollup, explode_items)
+from bom_store import create_bom_hierarchy_from_store
+
+HIERARCHY_COLUMNS = ['Order', 'Production Index', 'Level', 'Parent Index', 'Child Index', 'QTY Per', 'Total Quantity']
+
+
+def assert_same_hierarchy(result, expected):
+    pdt.assert_frame_equal(result[HIERARCHY_COLUMNS].reset_index(drop=True),
+                           expected[HIERARCHY_COLUMNS].reset_index(drop=True), check_dtype=False)
+
+
+def test_explosion_matches_baseline(mrp_data, quiet):
+    top_level_indices = mrp_data.top_level_indices()
+    with quiet():
+        hierarchy_df, _ = create_bom_hierarchy(mrp_data.bom, top_level_indices)
+    expected_df, _ = baseline.create_bom_hierarchy(baseline.plain(mrp_data.bom), top_level_indices)
+    assert_same_hierarchy(hierarchy_df, expected_df)
+
+
+def test_circular_references_cover_the_baseline(mrp_data, quiet):
+    top_level_indices = mrp_data.top_level_indices()
+    with quiet():
+        _, circular_references = create_bom_hierarchy(mrp_data.bom, top_level_indices)
+    _, expected_references = baseline.create_bom_hierarchy(baseline.plain(mrp_data.bom), top_level_indices)
+    # Every link of a reached circular reference is reported, not only the ones the original happened to cut
+    # (the row-wise original reads the item indices back as floats)
+    assert {(int(parent), int(child)) for parent, child in expected_references} <= circular_references
+    cycles = [set(members) for members in BomIndex(mrp_data.bom).cycles()]
+    assert all(any({parent, child} <= members for members in cycles) for parent, child in circular_references)
+
+
+@pytest.mark.parametrize('mrp_data', ['shared'], indirect=True)
+def test_shared_subassemblies_are_exploded_once(mrp_data):
+    bom_index = BomIndex(mrp_data.bom)
+    explosion = BomExplosion(bom_index)
+    rows = HierarchyRows()
+    for index in dict.fromkeys(mrp_data.top_level_indices()):
+        build_indented_bom(explosion, index, rows)
+    assert explosion.memo_hits > 0
+    assert explosion.memo_misses == len(explosion.memo)
+
+
+def test_rollup_sums_the_hierarchy(mrp_data, quiet):
+    top_level_indices = mrp_data.top_level_indices()
+    with quiet():
+        hierarchy_df, _ = create_bom_hierarchy(mrp_data.bom, top_level_indices)
+    rollup_df = create_bom_rollup(mrp_data.bom, top_level_indices)
+    expected = hierarchy_df.groupby(['Production Index', 'Child Index'])['Total Quantity'].sum()
+    result = rollup_df.set_index(['Production Index', 'Child Index'])['Total Quantity']
+    pdt.assert_series_equal(result.sort_index(), expected.astype(float).sort_index(), check_dtype=False,
+                            check_index_type=False)
+
+
+def test_store_matches_explosion(mrp_data, quiet, tmp_path):
+    store_file = str(tmp_path / "store.sqlite")
+    top_level_indices = mrp_data.top_level_indices()
+    with quiet():
+        expected_df, expected_references = create_bom_hierarchy(mrp_data.bom, top_level_indices)
+        # First run explodes and stores every item, the second reads them all back
+        for _ in range(2):
+            stored_df, circular_references = create_bom_hierarchy_from_store(mrp_data.bom, top_level_indices,
+                                                                             store_file)
+            assert_same_hierarchy(stored_df, expected_df)
+            assert circular_references == expected_references
+
+
+def test_store_re_explodes_changed_items(mrp_data, quiet, tmp_path):
+    store_file = str(tmp_path / "store.sqlite")
+    top_level_indices = mrp_data.top_level_indices()
+    changed_bom = mrp_data.bom.copy()
+    changed_bom.loc[changed_bom.index[-1], 'QTY Per'] += 1
+    with quiet():
+        create_bom_hierarchy_from_store(mrp_data.bom, top_level_indices, store_file)
+        stored_df, _ = create_bom_hierarchy_from_store(changed_bom, top_level_indices, store_file)
+        expected_df, _ = create_bom_hierarchy(changed_bom, top_level_indices)
+    assert_same_hierarchy(stored_df, expected_df)
+
+
+def test_parallel_explosion_matches_serial(mrp_data, quiet):
+    bom_index = BomIndex(mrp_data.bom)
+    top_level_indices = mrp_data.top_level_indices()
+    with quiet():
+        serial_df = explode_items(bom_index, top_level_indices, workers=1)
+        parallel_df = explode_items(bom_index, top_level_indices, workers=2)
+    pdt.assert_frame_equal(parallel_df, serial_df)
+
+
+def test_parent_row_points_at_the_parent_line(mrp_data, quiet):
+    with quiet():
+        hierarchy_df, _ = create_bom_hierarchy(mrp_data.bom, mrp_data.top_level_indices())
+    # 'Parent Row' is a position among the rows of the same production item
+    position = hierarchy_df.groupby('Production Index').cumcount()
+    starts = (hierarchy_df.index.to_series() - position).to_numpy()
+    nested = hierarchy_df['Level'] > 0
+    parents = hierarchy_df.iloc[starts[nested] + hierarchy_df.loc[nested, 'Parent Row'].to_numpy()]
+    nested = hierarchy_df[nested]
+    assert (parents['Child Index'].to_numpy() == nested['Parent Index'].to_numpy()).all()
+    assert (parents['Level'].to_numpy() == nested['Level'].to_numpy() - 1).all()
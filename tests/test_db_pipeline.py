@@ -0,0 +1,74 @@
+# tests/test_db_pipeline.py
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import db_extract
+from db_pipeline import build_mrp_data, extract_all, run_pipeline
+
+# Plain-SQL stand-ins for the extractors' queries, over SQLite tables holding the columns each query returns
+SQLITE_QUERIES = {
+    'items': "SELECT ItemIndex, [No_], [Rev#], ReplenishmentAdjusted FROM items ORDER BY ItemIndex",
+    'bom': "SELECT [Production BOM No_], [Version Code], [No_], [Quantity per] FROM bom_lines",
+    'inventory': "SELECT [No_], Inventory FROM inventory",
+    'sales': "SELECT [No_], Customer, [Document No_], [Date], QTY FROM sales",
+    'open_purchases': "SELECT [No_], [Expected Receipt Date], [Document No_], QTY FROM open_purchases",
+}
+
+# FG has two revisions with different BOMs; PART is purchased, so its BOM line is dropped
+TABLES = {
+    'items': pd.DataFrame({
+        'ItemIndex': [1, 2, 3, 4, 5, 6],
+        'No_': ['FG', 'FG', 'SUB', 'A', 'B', 'PART'],
+        'Rev#': ['A', 'B', '', '', '', ''],
+        'ReplenishmentAdjusted': ['Output', 'Output', 'Assembly', 'Purchase', 'Purchase', 'Purchase'],
+    }),
+    'bom_lines': pd.DataFrame({
+        'Production BOM No_': ['FG', 'FG', 'FG', 'SUB', 'PART'],
+        'Version Code': ['A', 'B', 'B', '', ''],
+        'No_': ['SUB', 'SUB', 'B', 'A', 'B'],
+        'Quantity per': [1.0, 2.0, 1.0, 3.0, 1.0],
+    }),
+    'inventory': pd.DataFrame({'No_': ['SUB', 'UNKNOWN'], 'Inventory': [1.0, 4.0]}),
+    'sales': pd.DataFrame({'No_': ['FG'], 'Customer': ['C1'], 'Document No_': ['SO1'], 'Date': ['2025-01-02'],
+                           'QTY': [5.0]}),
+    'open_purchases': pd.DataFrame({'No_': ['A'], 'Expected Receipt Date': ['2025-01-01'], 'Document No_': ['PO1'],
+                                    'QTY': [2.0]}),
+}
+
+
+@pytest.fixture
+def sqlite_database(tmp_path, monkeypatch):
+    """An SQLite database with the stand-in tables, used as the extractors' shared engine."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'extract_test.db'}")
+    for name, df in TABLES.items():
+        df.to_sql(name, engine, index=False)
+    monkeypatch.setattr(db_extract, '_engine', engine)
+    yield engine
+    engine.dispose()
+
+
+def test_bom_keeps_one_version_per_parent(sqlite_database, quiet):
+    with quiet():
+        mrp_data = build_mrp_data(extract_all(SQLITE_QUERIES))
+    bom = mrp_data.bom[['Parent Index', 'Child Index', 'QTY Per']].values.tolist()
+    # FG's index is its first revision (A), whose BOM is the one kept
+    assert bom == [[1, 3, 1.0], [3, 4, 3.0]]
+    assert mrp_data.inventory['Index'].tolist() == [3]
+    assert mrp_data.sales_orders['Index'].tolist() == [1]
+
+
+def test_failed_query_stops_the_extraction(sqlite_database, quiet):
+    with quiet():
+        assert extract_all({**SQLITE_QUERIES, 'sales': "SELECT * FROM missing_table"}) is None
+
+
+def test_pipeline_nets_the_extracted_data(sqlite_database, quiet):
+    with quiet():
+        final_df, inventory_df = run_pipeline(SQLITE_QUERIES)
+    sales = final_df[final_df['Transaction Type'] != 'Purchase']
+    net = dict(zip(sales['Child Item'], sales['Net Requirements']))
+    # SUB: 5 needed, 1 in stock; A: 4 x 3 needed, 2 received the day before
+    assert net == pytest.approx({'SUB': 4.0, 'A': 10.0})
+    # The pooled connections are closed once the run is over
+    assert db_extract._engine is None
@@ -0,0 +1,18 @@
+# tests/test_dtype_plan.py
+import pandas as pd
+
+from dtype_plan import apply_dtype_plan
+
+
+def test_dates_are_parsed_from_text_and_excel_serials():
+    df = pd.DataFrame({'Date': ['2025-01-01', None], 'Expected Receipt Date': [45658, 45689.0]})
+    dates = apply_dtype_plan(df)
+    assert dates['Date'].tolist()[0] == pd.Timestamp('2025-01-01')
+    assert dates['Date'].isna().tolist() == [False, True]
+    # Excel serial day numbers, not nanoseconds since 1970
+    assert dates['Expected Receipt Date'].tolist() == [pd.Timestamp('2025-01-01'), pd.Timestamp('2025-02-01')]
+
+
+def test_columns_that_are_not_all_dates_keep_their_values():
+    df = pd.DataFrame({'Date': pd.Series(['2025-01-01', 5], dtype=object), 'Expected Receipt Date': ['soon', None]})
+    pd.testing.assert_frame_equal(apply_dtype_plan(df), df)
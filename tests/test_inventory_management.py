@@ -0,0 +1,124 @@
+# tests/test_inventory_management.py
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+import baseline
+import inventory_management
+from bom_explosion import create_bom_hierarchy
+from data_loader import MrpData
+from inventory_management import allocate_inventory, consume_inventory, process_transactions, save_results
+
+
+def assert_matches_row_by_row(function, reference, seed, n_rows=400, n_slots=30):
+    """Run 'function' and its row-by-row 'reference' on rows spread over a few slots (some stock negative)."""
+    rng = np.random.default_rng(seed)
+    slots = rng.integers(-1, n_slots, n_rows)
+    demand = rng.integers(0, 20, n_rows).astype(float)
+    available = rng.integers(-10, 60, n_slots).astype(float)
+    used = np.zeros(n_slots)
+    expected_available, expected_used = available.copy(), used.copy()
+    result = function(slots, demand, available, used)
+    expected = reference(slots, demand, expected_available, expected_used)
+    for values, expected_values in zip(np.atleast_2d(result), np.atleast_2d(expected)):
+        np.testing.assert_allclose(values, expected_values)
+    np.testing.assert_allclose(available, expected_available)
+    np.testing.assert_allclose(used, expected_used)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_allocate_inventory_matches_row_by_row(seed):
+    assert_matches_row_by_row(allocate_inventory, baseline.allocate_inventory, seed)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_consume_inventory_matches_row_by_row(seed):
+    assert_matches_row_by_row(consume_inventory, baseline.consume_inventory, seed)
+
+
+def test_transactions_match_baseline(mrp_data, quiet):
+    with quiet():
+        hierarchy_df, _ = create_bom_hierarchy(mrp_data.bom, mrp_data.top_level_indices())
+        final_df, inventory_df = process_transactions(hierarchy_df, mrp_data)
+    expected_hierarchy = baseline.plain(hierarchy_df).drop(columns='Parent Row')
+    expected_df, expected_inventory = baseline.process_transactions(expected_hierarchy, mrp_data)
+
+    pdt.assert_frame_equal(baseline.plain(final_df), expected_df, check_dtype=False)
+    pdt.assert_frame_equal(inventory_df, expected_inventory, check_dtype=False)
+
+
+def test_unknown_parent_ratio_lookup_raises(mrp_data, quiet, monkeypatch):
+    monkeypatch.setattr(inventory_management, 'PARENT_RATIO_LOOKUP', 'closest')
+    with quiet():
+        hierarchy_df, _ = create_bom_hierarchy(mrp_data.bom, mrp_data.top_level_indices())
+        with pytest.raises(ValueError):
+            process_transactions(hierarchy_df, mrp_data)
+
+
+# --- Small hand-made cases ---
+
+ITEM_TABLE = pd.DataFrame({'Item Index': [1, 2, 3, 4], 'No_': ['FG', 'SUB', 'A', 'B'], 'Rev #': ['', '', '', '']})
+BOM = pd.DataFrame({'Parent Index': [1, 2, 2], 'Child Index': [2, 3, 4], 'QTY Per': [1.0, 2.0, 3.0]})
+
+
+def net_requirements(mrp_data, quiet, bucket=None):
+    """Net Requirements of each sales row by child item."""
+    with quiet():
+        hierarchy_df, _ = create_bom_hierarchy(mrp_data.bom, mrp_data.top_level_indices())
+        final_df, _ = process_transactions(hierarchy_df, mrp_data, bucket)
+    sales = final_df[final_df['Transaction Type'] != 'Purchase']
+    return dict(zip(sales['Child Item'], sales['Net Requirements']))
+
+
+def test_undated_order_is_netted_as_one_group(quiet):
+    sales = pd.DataFrame({'Index': [1], 'QTY': [5.0], 'Date': pd.to_datetime([None]), 'Document No_': ['SO1']})
+    inventory = pd.DataFrame({'Index': [2], 'Inventory': [1.0]})
+    purchases = pd.DataFrame({'Index': [3], 'QTY': [1.0], 'Expected Receipt Date': pd.to_datetime(['2025-01-01']),
+                              'Document No_': ['PO1']})
+    net = net_requirements(MrpData(BOM, sales, inventory, ITEM_TABLE, purchases), quiet)
+    # SUB takes 1 of 5 from stock, so its components are netted at a ratio of 0.8 (A's receipt came first)
+    assert net == pytest.approx({'SUB': 4.0, 'A': 10.0 * 0.8 - 1.0, 'B': 15.0 * 0.8})
+
+
+def same_date_receipt_case():
+    """A sale of FG and a receipt of its subassembly on one date; the purchase document sorts first."""
+    sales = pd.DataFrame({'Index': [1], 'QTY': [5.0], 'Date': pd.to_datetime(['2025-01-01']), 'Document No_': ['SO1']})
+    inventory = pd.DataFrame({'Index': [4], 'Inventory': [0.0]})
+    purchases = pd.DataFrame({'Index': [2], 'QTY': [5.0], 'Expected Receipt Date': pd.to_datetime(['2025-01-01']),
+                              'Document No_': ['PO1']})
+    return MrpData(BOM, sales, inventory, ITEM_TABLE, purchases)
+
+
+@pytest.mark.parametrize('bucket', ['day', 'week', 'month'])
+def test_buckets_net_demand_before_receipts(bucket, quiet):
+    net = net_requirements(same_date_receipt_case(), quiet, bucket)
+    assert net['SUB'] == 5.0
+
+
+def test_documents_keep_document_number_order(quiet):
+    # As in the original pipeline, PO1 is received before SO1 is netted
+    net = net_requirements(same_date_receipt_case(), quiet)
+    assert net['SUB'] == 0.0
+
+
+@pytest.mark.parametrize('bucket', ['day', 'week'])
+def test_buckets_keep_the_totals(mrp_data, bucket, quiet):
+    with quiet():
+        hierarchy_df, _ = create_bom_hierarchy(mrp_data.bom, mrp_data.top_level_indices())
+        final_df, inventory_df = process_transactions(hierarchy_df, mrp_data, bucket)
+    sales = final_df[final_df['Transaction Type'] != 'Purchase'].drop_duplicates(['Production Item', 'Document No_'])
+    assert sales['Open Sales QTY'].sum() == pytest.approx(mrp_data.sales_orders['QTY'].sum())
+    receipts = final_df.loc[final_df['Transaction Type'] == 'Purchase', 'Production QTY'].sum()
+    assert receipts == pytest.approx(mrp_data.purchases['QTY'].sum())
+    assert inventory_df['Inventory'].sum() == pytest.approx(mrp_data.inventory['Inventory'].sum() + receipts)
+
+
+def test_export_is_optional(mrp_data, quiet, tmp_path):
+    with quiet():
+        hierarchy_df, _ = create_bom_hierarchy(mrp_data.bom, mrp_data.top_level_indices())
+        final_df, inventory_df = process_transactions(hierarchy_df, mrp_data, export=False)
+        assert not any(tmp_path.glob('*.xlsx'))
+        net_requirements_file, inventory_file = save_results(final_df, inventory_df)
+    pdt.assert_frame_equal(pd.read_excel(inventory_file), inventory_df, check_dtype=False)
+    assert len(pd.read_excel(net_requirements_file)) == len(final_df)
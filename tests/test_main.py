@@ -0,0 +1,17 @@
+# tests/test_main.py
+import pandas as pd
+
+import main
+from benchmarks.generator import write_workbook
+from config import OUTPUT_BOM_ROLLUP
+
+
+def test_rollup_switch_writes_the_rollup(mrp_data, quiet, monkeypatch):
+    write_workbook(mrp_data, "MRP Data.xlsx")
+    monkeypatch.setattr(main, 'EXCEL_FILE', "MRP Data.xlsx")
+    with quiet():
+        main.main(rollup=True)
+    rollup_df = pd.read_excel(OUTPUT_BOM_ROLLUP)
+    assert list(rollup_df.columns) == ['Production Index', 'Child Index', 'Total Quantity', 'Production Item',
+                                       'Child Item']
+    assert rollup_df['Child Item'].notna().all()
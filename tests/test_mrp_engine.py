@@ -0,0 +1,75 @@
+# tests/test_mrp_engine.py
+import numpy as np
+import pytest
+
+import inventory_management
+from benchmarks.generator import generate_mrp_data
+from bom_explosion import create_bom_hierarchy
+from data_loader import MrpData
+from inventory_management import process_transactions
+from mrp_engine import net_requirements, plan_by_low_level_code
+
+
+def documented_case(seed):
+    """
+    A data set on which the two engines must agree (see plan_by_low_level_code): no circular references,
+    and no sold item is also a component or purchased.
+    """
+    mrp_data = generate_mrp_data({'n_items': 300, 'n_sales': 120, 'n_purchases': 60, 'cycle_rate': 0.0, 'seed': seed})
+    sales = mrp_data.sales_orders[~mrp_data.sales_orders['Index'].isin(mrp_data.bom['Child Index'])]
+    purchases = mrp_data.purchases[~mrp_data.purchases['Index'].isin(sales['Index'])]
+    return MrpData(mrp_data.bom, sales.reset_index(drop=True), mrp_data.inventory, mrp_data.item_table,
+                   purchases.reset_index(drop=True))
+
+
+def order_engine_planned_orders(final_df):
+    """Planned orders per (item, date) of the per-order engine: sold items' production plus components' net requirements."""
+    sales = final_df[final_df['Transaction Type'] != 'Purchase']
+    components = sales.groupby(['Child Item', 'Date'])['Net Requirements'].sum()
+    sold = sales[sales['Transaction Type'] == 'Production Items'].drop_duplicates(['Production Item', 'Document No_'])
+    sold = sold.groupby(['Production Item', 'Date'])['Production QTY'].sum()
+    sold.index.names = components.index.names
+    planned = components.add(sold, fill_value=0)
+    return planned[planned.abs() > 1e-9]
+
+
+@pytest.mark.parametrize('seed', [11, 13])
+@pytest.mark.parametrize('bucket', ['day', 'week'])
+def test_engines_agree_under_documented_conditions(seed, bucket, quiet, monkeypatch):
+    mrp_data = documented_case(seed)
+    monkeypatch.setattr(inventory_management, 'PARENT_RATIO_LOOKUP', 'parent row')
+    with quiet():
+        hierarchy_df, _ = create_bom_hierarchy(mrp_data.bom, mrp_data.top_level_indices())
+        final_df, order_inventory = process_transactions(hierarchy_df, mrp_data, bucket)
+        plan_df, llc_inventory = plan_by_low_level_code(mrp_data, bucket)
+
+    expected = order_engine_planned_orders(final_df)
+    planned = plan_df.set_index(['Item', 'Date'])['Planned Orders']
+    planned.index.names = expected.index.names
+    planned = planned[planned.abs() > 1e-9]
+    assert expected.sub(planned, fill_value=0).abs().max() == pytest.approx(0, abs=1e-6)
+
+    columns = ['Inventory', 'Used', 'Available', 'Initial Inventory']
+    order_inventory = order_inventory.set_index('No_')[columns].sort_index()
+    llc_inventory = llc_inventory.set_index('No_')[columns].sort_index()
+    assert order_inventory.index.equals(llc_inventory.index)
+    np.testing.assert_allclose(llc_inventory.to_numpy(dtype=float), order_inventory.to_numpy(dtype=float), atol=1e-6)
+
+
+def test_net_requirements_nets_receipts_after_demand():
+    gross = np.array([[5.0, 0.0, 4.0]])
+    receipts = np.array([[5.0, 0.0, 0.0]])
+    planned, projected = net_requirements(gross, receipts, np.array([2.0]))
+    # Period 1: 5 needed, 2 in stock, the same-period receipt arrives after the demand
+    np.testing.assert_allclose(planned, [[3.0, 0.0, 0.0]])
+    np.testing.assert_allclose(projected, [[5.0, 5.0, 1.0]])
+
+
+def test_plan_covers_every_level_of_a_circular_bom(quiet):
+    mrp_data = generate_mrp_data({'n_items': 200, 'n_sales': 80, 'n_purchases': 40, 'cycle_rate': 0.02, 'seed': 5})
+    with quiet():
+        plan_df, _ = plan_by_low_level_code(mrp_data, 'week')
+    assert (plan_df['Planned Orders'] >= 0).all()
+    # Net of stock and receipts, nothing is left uncovered at the end of the horizon
+    last = plan_df.groupby('Item').tail(1)
+    assert (last['Projected On Hand'] >= -1e-9).all()
@@ -0,0 +1,42 @@
+# tests/test_purchase_sync.py
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import db_extract
+import purchase_sync
+from purchase_sync import WATERMARK_DATE, load_stored_purchase_data, sync_purchase_data
+
+
+def history_line(document_no, posted):
+    return pd.DataFrame({'Status': ['HISTORY'], 'Document No_': [document_no], 'Line No_': [10000],
+                         'Buy-from Vendor No_': ['V1'], 'No_': ['A'], 'Order Date': [posted], 'Total': [10.0],
+                         'Quantity': [2.0], WATERMARK_DATE: [posted]})
+
+
+@pytest.fixture
+def purchase_database(tmp_path, monkeypatch):
+    """An SQLite database with the sync's stand-in tables, used as the extractors' shared engine."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'purchases.db'}")
+    history_line('PI1', '2025-03-10 00:00:00').to_sql('purchase_history_lines', engine, index=False)
+    history_line('OPEN1', None).drop(columns=WATERMARK_DATE).assign(Status='OPEN').to_sql(
+        'purchase_open_lines', engine, index=False)
+    monkeypatch.setattr(db_extract, '_engine', engine)
+    monkeypatch.setattr(purchase_sync, 'connection_string', str(engine.url))
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize('days_late, fetched', [(purchase_sync.WATERMARK_LOOKBACK_DAYS, True),
+                                                (purchase_sync.WATERMARK_LOOKBACK_DAYS + 1, False)])
+def test_sync_reaches_back_before_the_watermark(purchase_database, quiet, tmp_path, days_late, fetched):
+    store_file = str(tmp_path / "store.sqlite")
+    with quiet():
+        assert sync_purchase_data(store_file)
+        # A line posted after the first sync, but dated before the high-water mark
+        posted = str(pd.Timestamp('2025-03-10') - pd.Timedelta(days=days_late))
+        history_line('PI2', posted).to_sql('purchase_history_lines', purchase_database, if_exists='append',
+                                           index=False)
+        assert sync_purchase_data(store_file)
+    documents = load_stored_purchase_data(store_file)['Document No_'].tolist()
+    assert documents == (['OPEN1', 'PI1', 'PI2'] if fetched else ['OPEN1', 'PI1'])